@@ -1,4 +1,4 @@
-import gc
+import json
 import logging
 import os
 
@@ -6,12 +6,13 @@ import os
 import secrets
 import time
 import xml.etree.ElementTree as ET
+from dataclasses import astuple
 from datetime import timedelta
 from io import BytesIO
 from urllib.parse import urlencode
 
+import click
 import pandas as pd
-import requests
 from dotenv import load_dotenv
 from flask import Flask, abort, redirect, render_template, request, session, url_for
 from flask_limiter import Limiter
@@ -20,10 +21,18 @@ from flask_login import LoginManager, current_user, login_user, logout_user
 from flask_turnstile import Turnstile
 
 from database import DB_CONNECTION_URI, db_session, init_db
-from models import User
+from jobs import DONE, FAILED, JOB_MAX_PER_USER, QUEUED, TooManyJobsError, job_queue
+from mal_client import mal_client
+from models import AnimeLookupMiss, User
+from userlist import prepare_userlist_df, userlist_fingerprint
 from recommendations.engine import RecommendationEngine, RecommendationOpts
 from visualizer.api_helper import build_df_from_mal_api_data
-from visualizer.visualizer import VisualizationOptions, Visualizer
+from visualizer.cache import genre_cache
+from visualizer.chart_store import CHART_STORE_MAX_AGE, chart_store
+from visualizer.figures import IMAGE_MIMETYPES, figure_manager
+from visualizer.genre_writer import LookupMiss, upsert_lookup_misses
+from visualizer.result_cache import result_cache
+from visualizer.visualizer import VisualizationOptions, Visualizer, parse_charts
 
 load_dotenv("./credentials.env")
 init_db()
@@ -90,9 +99,25 @@ turnstile = Turnstile(
     secret_key=os.environ["TURNSTILE_SECRET_KEY"],
 )
 
+# loads the dataset and connects to qdrant on the first recommendation
 recommendation_engine = RecommendationEngine()
 
 
+@app.cli.command("seed-lookup-misses")
+@click.argument("not_found_file", default="anime_404.txt", type=click.File())
+def seed_lookup_misses(not_found_file):
+    """
+    Marks the anime ids listed in NOT_FOUND_FILE (one per line, as written by the
+    scraper) as not found, so that genre lookups don't query MAL for them.
+    """
+    anime_ids = {int(line) for line in not_found_file if line.strip()}
+    upsert_lookup_misses(
+        db_session, [LookupMiss(i, AnimeLookupMiss.NOT_FOUND) for i in anime_ids]
+    )
+    db_session.commit()
+    click.echo(f"Marked {len(anime_ids)} anime as not found.")
+
+
 @login_manager.user_loader
 def load_user(id):
     return db_session.get(User, int(id))
@@ -121,6 +146,16 @@ def ping():
     return {"ping": "pong"}
 
 
+@app.get("/cache-stats")
+def cache_stats():
+    return {
+        "genres": genre_cache.stats(),
+        "results": result_cache.stats(),
+        "figures": figure_manager.stats(),
+        "jobs": job_queue.stats(),
+    }
+
+
 @app.get("/")
 def home():
     return render_template("index.html", current_user=current_user)
@@ -178,7 +213,7 @@ def callback(provider: str):
         logger.warning(request.args)
         abort(401, provider)
 
-    resp = requests.post(
+    resp = mal_client.post(
         provider_data["token_url"],
         data={
             "client_id": provider_data["client_id"],
@@ -202,7 +237,7 @@ def callback(provider: str):
         abort(401, provider)
 
     # use the access token to get the username
-    response = requests.get(
+    response = mal_client.get(
         provider_data["userinfo_url"],
         headers={
             "Authorization": "Bearer " + oauth2_token,
@@ -234,7 +269,7 @@ def issue_new_token(user: User):
         logger.debug("unable to get provider data in issue_new_token")
         return False
 
-    resp = requests.post(
+    resp = mal_client.post(
         provider_data["token_url"],
         data={
             "client_id": provider_data["client_id"],
@@ -286,7 +321,7 @@ def fetch_mal_data(current_user):
     paging_available = True
     data = []
     while paging_available:
-        resp = requests.get(
+        resp = mal_client.get(
             animelist_url, headers={"Authorization": "Bearer " + oauth2_token}
         )
         if resp.status_code == 401:
@@ -308,15 +343,19 @@ def fetch_mal_data(current_user):
 
 
 def build_userlist_df(animelist_file):
+    """
+    Builds the prepared userlist dataframe, see `userlist.prepare_userlist_df`, either from
+    the uploaded animelist file or from the MAL API for logged in users.
+    """
     if animelist_file:
         xml_buf = process_uploaded_xml(animelist_file.stream)
-        return pd.read_xml(xml_buf)
+        return prepare_userlist_df(pd.read_xml(xml_buf))
 
     if not current_user.is_authenticated:
         abort(401, "myanimelist")
 
     data = fetch_mal_data(current_user)
-    return build_df_from_mal_api_data(data)
+    return prepare_userlist_df(build_df_from_mal_api_data(data))
 
 
 def leave_one_out_hit_rate(userlist_df: pd.DataFrame, opts: RecommendationOpts):
@@ -349,6 +388,143 @@ def visualize_page():
     return render_template("visualize.html")
 
 
+def visualization_response(
+    results: list[dict], summary: dict, plotly_template: dict | None
+) -> str:
+    response = {
+        "success": True,
+        "message": "All visualizations drawn successfully.",
+        "results": results,
+        "summary": summary,
+    }
+    if plotly_template is not None:
+        # shared by all the compact plotly figures
+        response["plotly_template"] = plotly_template
+    return json.dumps(response)
+
+
+def ndjson_line(message: dict) -> str:
+    return json.dumps(message) + "\n"
+
+
+def ndjson_response(lines):
+    response = app.response_class(lines, mimetype="application/x-ndjson")
+    # nginx would otherwise hold the lines back until the response is complete
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def stream_visualization(viz: Visualizer, cache_key: str | None):
+    """
+    Yields the summary of the animelist and then every result as soon as it is drawn,
+    as newline delimited JSON messages. The last message tells if drawing succeeded.
+    The complete response is cached once every result has been drawn.
+    """
+    summary = viz.get_summary()
+    plotly_template = viz.get_plotly_template()
+    yield ndjson_line(
+        {"type": "summary", "summary": summary, "plotly_template": plotly_template}
+    )
+
+    results = []
+    try:
+        for i, r in viz.iter_results():
+            result = r.as_dict()
+            results.append((i, result))
+            yield ndjson_line({"type": "result", "index": i, "result": result})
+    except Exception as e:
+        logger.exception(e)
+        yield ndjson_line(
+            {
+                "type": "done",
+                "success": False,
+                "message": "An unknown error occured. Please try again later.",
+            }
+        )
+        return
+
+    yield ndjson_line(
+        {
+            "type": "done",
+            "success": True,
+            "message": "All visualizations drawn successfully.",
+        }
+    )
+    if cache_key:
+        results_json = [result for _, result in sorted(results, key=lambda r: r[0])]
+        result_cache.set(
+            cache_key, visualization_response(results_json, summary, plotly_template)
+        )
+
+
+def stream_cached_visualization(cached: str):
+    """
+    Yields a cached response as the messages of `stream_visualization`.
+    """
+    response = json.loads(cached)
+    yield ndjson_line(
+        {
+            "type": "summary",
+            "summary": response["summary"],
+            "plotly_template": response.get("plotly_template"),
+        }
+    )
+    for i, result in enumerate(response["results"]):
+        yield ndjson_line({"type": "result", "index": i, "result": result})
+    yield ndjson_line({"type": "done", "success": True, "message": response["message"]})
+
+
+def visualize_userlist(
+    userlist_df: pd.DataFrame,
+    opts: VisualizationOptions,
+    charts: tuple[str, ...],
+    cache_key: str | None,
+) -> str:
+    """
+    Draws the given charts of the animelist, returns the serialized response and caches
+    it under `cache_key` if given.
+    """
+    viz = Visualizer(userlist_df, opts, charts)
+    results = viz.visualize_all()
+    summary = viz.get_summary()
+    plotly_template = viz.get_plotly_template()
+    results_json = [r.as_dict() for r in results]
+    del viz
+    response = visualization_response(results_json, summary, plotly_template)
+    if cache_key:
+        result_cache.set(cache_key, response)
+    return response
+
+
+def job_owner() -> str:
+    """
+    Returns who the jobs submitted by the current request count towards.
+    """
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"ip:{get_remote_address()}"
+
+
+def job_submitted_response(job_id: str):
+    return {
+        "success": True,
+        "message": "The job has been queued.",
+        "job_id": job_id,
+        "status": QUEUED,
+    }, 202
+
+
+def too_many_jobs_response():
+    return {
+        "success": False,
+        "message": (
+            f"You can't have more than {JOB_MAX_PER_USER} requests in progress at once."
+            " Please wait for them to finish."
+        ),
+        "results": [],
+    }, 429
+
+
 @app.post("/visualize")
 @limiter.limit("10/minute;1/6second")
 def visualize():
@@ -368,24 +544,65 @@ def visualize():
     else:
         interactive_charts = interactive_charts == "true"
 
-    opts = VisualizationOptions(disable_nsfw, False, interactive_charts)
+    # the client draws the charts itself
+    data_only = request.form.get("data_only") == "true"
+    # the client fetches the images of the charts from the chart store
+    image_urls = request.form.get("image_urls") == "true"
+    # the client puts the plotly template back in the figures
+    compact_figures = request.form.get("compact_figures") == "true"
+
+    opts = VisualizationOptions(
+        disable_nsfw,
+        False,
+        interactive_charts,
+        data_only,
+        image_urls,
+        compact_figures,
+    )
+    # results are sent one by one as soon as they are drawn
+    stream = request.form.get("stream") == "true"
+    # the charts are drawn in the background, the client polls /jobs/<job_id>
+    run_async = request.form.get("async") == "true"
     animelist_file = request.files.get("file")
 
+    # comma separated names of the charts to draw, all of them if empty
+    try:
+        charts = parse_charts(request.form.get("charts"))
+    except ValueError as e:
+        return {"success": False, "message": str(e).capitalize(), "results": []}, 400
+
     try:
-        # todo add a queued column in the database for every user
-        # for non-logged in users, hash the animelist file
         userlist_df = build_userlist_df(animelist_file)
-        viz = Visualizer(userlist_df, opts)
-        results = viz.visualize_all()
-        summary = viz.get_summary()
-        results_json = [r.as_dict() for r in results]
-        del viz
-        return {
-            "success": True,
-            "message": "All visualizations drawn successfully.",
-            "results": results_json,
-            "summary": summary,
-        }
+
+        # the same list drawn with the same options gives the same results, except for
+        # chart URLs which expire long before the cached results, only matplotlib
+        # charts are served from the chart store
+        results_key = result_cache.key(userlist_df, opts, charts)
+        chart_urls = image_urls and not interactive_charts and not data_only
+        cache_key = None if chart_urls else results_key
+        cached = result_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            if stream and not run_async:
+                return ndjson_response(stream_cached_visualization(cached))
+            return app.response_class(cached, mimetype="application/json")
+
+        if run_async:
+            job_id = job_queue.submit(
+                job_owner(),
+                f"visualize:{results_key}",
+                lambda: visualize_userlist(userlist_df, opts, charts, cache_key),
+            )
+            return job_submitted_response(job_id)
+
+        if stream:
+            viz = Visualizer(userlist_df, opts, charts)
+            return ndjson_response(stream_visualization(viz, cache_key))
+
+        response = visualize_userlist(userlist_df, opts, charts, cache_key)
+        return app.response_class(response, mimetype="application/json")
+
+    except TooManyJobsError:
+        return too_many_jobs_response()
 
     except ET.ParseError:
         return {
@@ -402,8 +619,44 @@ def visualize():
             "results": [],
         }
 
-    finally:
-        gc.collect()
+
+@app.get("/charts/<key>")
+@limiter.limit("300/minute;30/second")
+def chart_image(key: str):
+    image = chart_store.get(key)
+    if image is None:
+        abort(404)
+
+    format = key.rsplit(".", 1)[1]
+    response = app.response_class(image, mimetype=IMAGE_MIMETYPES[format])
+    # the key is the hash of the image, it never changes
+    response.headers["Cache-Control"] = (
+        f"public, max-age={CHART_STORE_MAX_AGE}, immutable"
+    )
+    return response
+
+
+@app.get("/jobs/<job_id>")
+# polled every second by the clients while their jobs run
+@limiter.limit("300/minute;10/second")
+def job_status(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return {
+            "success": False,
+            "status": None,
+            "message": "No such job, it may have expired. Please try again.",
+        }, 404
+
+    if job.status == DONE:
+        # the result is already serialized, embed it as is
+        return app.response_class(
+            f'{{"success": true, "status": "{DONE}", "response": {job.result}}}',
+            mimetype="application/json",
+        )
+    if job.status == FAILED:
+        return {"success": False, "status": job.status, "message": job.message}
+    return {"success": True, "status": job.status}
 
 
 @app.get("/recommendations")
@@ -411,6 +664,23 @@ def recommendations_page():
     return render_template("recommendations.html")
 
 
+def recommend_userlist(userlist_df: pd.DataFrame, opts: RecommendationOpts) -> str:
+    """
+    Returns the serialized response with the recommendations for the animelist.
+    """
+    init = time.perf_counter()
+    recs = recommendation_engine.recommendations(userlist_df, opts)
+    end = time.perf_counter()
+    print(end - init)
+    return json.dumps(
+        {
+            "success": True,
+            "message": "Recommendations generated successfully.",
+            "results": [rec.to_dict() for rec in recs],
+        }
+    )
+
+
 @app.post("/recommendations")
 @limiter.limit("15/minute;1/second")
 def recommend():
@@ -424,19 +694,26 @@ def recommend():
         disable_nsfw = False
 
     opts = RecommendationOpts(disable_nsfw, True)
+    # generated in the background, the client polls /jobs/<job_id>
+    run_async = request.form.get("async") == "true"
     animelist_file = request.files.get("file")
 
     try:
         userlist_df = build_userlist_df(animelist_file)
-        init = time.perf_counter()
-        recs = recommendation_engine.recommendations(userlist_df, opts)
-        end = time.perf_counter()
-        print(end - init)
-        return {
-            "success": True,
-            "message": "Recommendations generated successfully.",
-            "results": [rec.to_dict() for rec in recs],
-        }
+        if run_async:
+            opts_key = "-".join(str(int(v)) for v in astuple(opts))
+            job_id = job_queue.submit(
+                job_owner(),
+                f"recommend:{userlist_fingerprint(userlist_df)}-{opts_key}",
+                lambda: recommend_userlist(userlist_df, opts),
+            )
+            return job_submitted_response(job_id)
+
+        response = recommend_userlist(userlist_df, opts)
+        return app.response_class(response, mimetype="application/json")
+
+    except TooManyJobsError:
+        return too_many_jobs_response()
 
     except ET.ParseError:
         return {
@@ -0,0 +1,47 @@
+# read by gunicorn when it is started from the project root, settings passed on the
+# command line take precedence over the ones below
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv("./credentials.env")
+
+wsgi_app = "wsgi:app"
+
+# the app is loaded and warmed up in the master, before the workers are forked, so
+# that they share its memory copy-on-write and their first requests are fast
+preload_app = os.getenv("GUNICORN_PRELOAD_APP", "1") == "1"
+
+
+def _warm_up():
+    # the app has already been loaded by gunicorn, this doesn't import it again
+    from app import recommendation_engine
+    from warmup import warm_up
+
+    warm_up(recommendation_engine)
+
+
+def when_ready(server):
+    if preload_app:
+        server.log.info("warming up the app before forking the workers")
+        _warm_up()
+
+
+def post_fork(server, worker):
+    # the connections the master opened while loading the app belong to it, the pool of
+    # the worker must start empty without closing them under the master's feet
+    from database import engine
+
+    engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    from visualizer.render_pool import warm_render_pool
+    from warmup import warm_up_worker
+
+    if not preload_app:
+        # every worker loaded the app on its own, warm it up before it takes requests
+        worker.log.info("warming up the worker")
+        _warm_up()
+    warm_render_pool()
+    warm_up_worker()
@@ -0,0 +1,286 @@
+import logging
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable
+
+import redis
+from dotenv import load_dotenv
+
+from database import db_session
+from visualizer.cache import get_redis_client
+
+load_dotenv("./credentials.env")
+
+# threads jobs are run in, per worker
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# jobs a user can have queued or running at once
+JOB_MAX_PER_USER = int(os.getenv("JOB_MAX_PER_USER", "2"))
+# finished jobs, along with their results, are kept for this many seconds
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "600"))
+# unfinished jobs are forgotten after this many seconds, so that the jobs of a crashed
+# worker don't count towards the limit of their users forever
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class TooManyJobsError(Exception):
+    """
+    Raised when a user submits a job while already having `JOB_MAX_PER_USER` jobs.
+    """
+
+
+@dataclass(frozen=True)
+class Job:
+    id: str
+    status: str
+    # the serialized JSON response of a done job
+    result: str | None = None
+    # why a job failed
+    message: str | None = None
+
+
+class RedisJobStore:
+    """
+    Keeps the jobs in redis, so that any worker can tell how a job is doing.
+    In-flight jobs are indexed by their deduplication key, and the in-flight jobs of
+    every owner are counted.
+    """
+
+    KEY_PREFIX = "animeviz:jobs:"
+    DEDUP_PREFIX = "animeviz:jobs-dedup:"
+    ACTIVE_PREFIX = "animeviz:jobs-active:"
+
+    def __init__(self, client: redis.Redis, max_per_owner: int) -> None:
+        self.client = client
+        self.max_per_owner = max_per_owner
+
+    def reserve(self, owner: str, dedup_key: str, job_id: str) -> tuple[str, bool]:
+        """
+        Returns the id of the in-flight job with the same deduplication key if there
+        is one, otherwise queues a job with the given id. The second item tells if the
+        job was queued.
+        """
+        dedup = f"{self.DEDUP_PREFIX}{dedup_key}"
+        if (existing := self.client.get(dedup)) is not None:
+            return existing.decode(), False
+
+        active = f"{self.ACTIVE_PREFIX}{owner}"
+        pipe = self.client.pipeline()
+        pipe.incr(active)
+        pipe.expire(active, JOB_TIMEOUT)
+        count, _ = pipe.execute()
+        if count > self.max_per_owner:
+            self.client.decr(active)
+            raise TooManyJobsError(owner)
+
+        if not self.client.set(dedup, job_id, nx=True, ex=JOB_TIMEOUT):
+            # a concurrent request submitted the same job meanwhile
+            self.client.decr(active)
+            existing = self.client.get(dedup)
+            return (existing or job_id.encode()).decode(), False
+
+        pipe = self.client.pipeline()
+        pipe.hset(f"{self.KEY_PREFIX}{job_id}", "status", QUEUED)
+        pipe.expire(f"{self.KEY_PREFIX}{job_id}", JOB_TIMEOUT)
+        pipe.execute()
+        return job_id, True
+
+    def set_running(self, job_id: str):
+        self.client.hset(f"{self.KEY_PREFIX}{job_id}", "status", RUNNING)
+
+    def finish(self, job: Job, owner: str, dedup_key: str):
+        key = f"{self.KEY_PREFIX}{job.id}"
+        fields = {"status": job.status}
+        if job.result is not None:
+            fields["result"] = job.result
+        if job.message is not None:
+            fields["message"] = job.message
+
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, JOB_RESULT_TTL)
+        pipe.delete(f"{self.DEDUP_PREFIX}{dedup_key}")
+        pipe.execute()
+
+        active = f"{self.ACTIVE_PREFIX}{owner}"
+
+        def release(pipe):
+            # the counter may have expired while the job ran, it never goes below 0
+            count = pipe.get(active)
+            pipe.multi()
+            if count is not None and int(count) > 0:
+                pipe.decr(active)
+
+        self.client.transaction(release, active)
+
+    def get(self, job_id: str) -> Job | None:
+        fields = self.client.hgetall(f"{self.KEY_PREFIX}{job_id}")
+        if not fields:
+            return None
+        fields = {k.decode(): v.decode() for k, v in fields.items()}
+        return Job(
+            job_id, fields["status"], fields.get("result"), fields.get("message")
+        )
+
+
+class MemoryJobStore:
+    """
+    Keeps the jobs in this process, like `RedisJobStore` does in redis.
+    Jobs are only visible to the worker they were submitted to.
+    """
+
+    def __init__(self, max_per_owner: int) -> None:
+        self.max_per_owner = max_per_owner
+        self._lock = Lock()
+        self._jobs: dict[str, tuple[float, Job]] = {}
+        self._dedup: dict[str, str] = {}
+        self._active: dict[str, int] = {}
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [i for i, (expires_at, _) in self._jobs.items() if expires_at < now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def reserve(self, owner: str, dedup_key: str, job_id: str) -> tuple[str, bool]:
+        with self._lock:
+            self._expire()
+            if dedup_key in self._dedup:
+                return self._dedup[dedup_key], False
+            if self._active.get(owner, 0) >= self.max_per_owner:
+                raise TooManyJobsError(owner)
+
+            self._active[owner] = self._active.get(owner, 0) + 1
+            self._dedup[dedup_key] = job_id
+            self._jobs[job_id] = (time.monotonic() + JOB_TIMEOUT, Job(job_id, QUEUED))
+            return job_id, True
+
+    def set_running(self, job_id: str):
+        with self._lock:
+            if job_id in self._jobs:
+                expires_at, _ = self._jobs[job_id]
+                self._jobs[job_id] = (expires_at, Job(job_id, RUNNING))
+
+    def finish(self, job: Job, owner: str, dedup_key: str):
+        with self._lock:
+            self._jobs[job.id] = (time.monotonic() + JOB_RESULT_TTL, job)
+            self._dedup.pop(dedup_key, None)
+            self._active[owner] = self._active.get(owner, 1) - 1
+            if self._active[owner] <= 0:
+                del self._active[owner]
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            self._expire()
+            entry = self._jobs.get(job_id)
+            return entry[1] if entry else None
+
+
+class JobQueue:
+    """
+    Runs heavy requests in the background. Submitting returns a job id right away, the
+    job is run by a pool of `workers` threads of this process and its status and result
+    are fetched with `get`.
+
+    A job with the same deduplication key as an in-flight one isn't run again, the id of
+    the in-flight job is returned instead.
+    """
+
+    def __init__(
+        self, store: RedisJobStore | MemoryJobStore, workers: int = JOB_WORKERS
+    ) -> None:
+        self.store = store
+        self.workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+        self._lock = Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls):
+        client = get_redis_client()
+        if client is not None:
+            return cls(RedisJobStore(client, JOB_MAX_PER_USER))
+        return cls(MemoryJobStore(JOB_MAX_PER_USER))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # threads don't survive a fork, start a pool per process lazily
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix="job"
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, owner: str, dedup_key: str, fn: Callable[[], str]) -> str:
+        """
+        Queues `fn`, which returns the serialized JSON response of the job, and returns
+        the id of the job. Raises `TooManyJobsError` if the owner has too many jobs.
+        """
+        try:
+            job_id, created = self.store.reserve(
+                owner, dedup_key, secrets.token_urlsafe(16)
+            )
+        except TooManyJobsError:
+            with self._lock:
+                self.rejected += 1
+            raise
+
+        with self._lock:
+            if created:
+                self.submitted += 1
+            else:
+                self.deduplicated += 1
+        if created:
+            self._get_executor().submit(self._run, job_id, owner, dedup_key, fn)
+        return job_id
+
+    def _run(self, job_id: str, owner: str, dedup_key: str, fn: Callable[[], str]):
+        try:
+            self.store.set_running(job_id)
+            job = Job(job_id, DONE, result=fn())
+        except Exception as e:
+            logging.error(f"job {job_id} failed")
+            logging.exception(e)
+            job = Job(
+                job_id,
+                FAILED,
+                message="An unknown error occured. Please try again later.",
+            )
+        finally:
+            # jobs query the database outside of any request
+            db_session.remove()
+
+        try:
+            self.store.finish(job, owner, dedup_key)
+        except redis.RedisError as e:
+            logging.error(f"unable to store the outcome of job {job_id}")
+            logging.exception(e)
+
+    def get(self, job_id: str) -> Job | None:
+        return self.store.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.store).__name__,
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+            }
+
+
+job_queue = JobQueue.from_env()
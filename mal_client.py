@@ -0,0 +1,118 @@
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from threading import BoundedSemaphore
+
+import niquests
+from dotenv import load_dotenv
+
+load_dotenv("./credentials.env")
+
+MAL_MAX_CONCURRENCY = int(os.getenv("MAL_MAX_CONCURRENCY", "16"))
+MAL_MAX_RETRIES = int(os.getenv("MAL_MAX_RETRIES", "3"))
+MAL_DEFAULT_DEADLINE = float(os.getenv("MAL_DEFAULT_DEADLINE", "20"))
+
+logger = logging.getLogger(__name__)
+
+
+class MALClient:
+    """
+    HTTP client shared by everything talking to MyAnimeList.
+
+    Requests go through a single pooled session (keep-alive, HTTP/2 when negotiated),
+    at most `max_concurrency` of them are in flight at once, and every call has a deadline
+    which bounds the total time spent on it, retries included.
+    Responses with a status in `RETRY_STATUSES` are retried with exponential backoff,
+    honouring the `Retry-After` header when MAL sends one.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    # non idempotent requests are only retried when they were rate limited
+    NON_IDEMPOTENT_RETRY_STATUSES = (429,)
+    BACKOFF_BASE = 0.5
+    BACKOFF_CAP = 8.0
+
+    def __init__(
+        self,
+        max_concurrency: int = MAL_MAX_CONCURRENCY,
+        max_retries: int = MAL_MAX_RETRIES,
+        default_deadline: float = MAL_DEFAULT_DEADLINE,
+    ) -> None:
+        self.max_retries = max_retries
+        self.default_deadline = default_deadline
+        self._semaphore = BoundedSemaphore(max_concurrency)
+        # the pool is as large as the allowed concurrency so connections are always reused
+        self.session = niquests.Session(
+            pool_connections=max_concurrency, pool_maxsize=max_concurrency
+        )
+
+    @staticmethod
+    def _retry_after(resp: niquests.Response) -> float | None:
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.BACKOFF_CAP, self.BACKOFF_BASE * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def request(
+        self, method: str, url: str, deadline: float | None = None, **kwargs
+    ) -> niquests.Response:
+        """
+        Sends a request, retrying it while `deadline` seconds haven't passed.
+        Raises `niquests.Timeout` if the deadline is exceeded before a response is received,
+        and `niquests.ConnectionError` if MAL couldn't be reached after all the retries.
+        """
+        deadline = self.default_deadline if deadline is None else deadline
+        ends_at = time.monotonic() + deadline
+        idempotent = method.upper() in ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+        retry_statuses = (
+            self.RETRY_STATUSES if idempotent else self.NON_IDEMPOTENT_RETRY_STATUSES
+        )
+
+        attempt = 0
+        while True:
+            remaining = ends_at - time.monotonic()
+            if remaining <= 0:
+                raise niquests.Timeout(f"deadline of {deadline}s exceeded for {url}")
+
+            try:
+                with self._semaphore:
+                    resp = self.session.request(method, url, timeout=remaining, **kwargs)
+            except niquests.ConnectionError:
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if resp.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return resp
+                delay = self._retry_after(resp)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                if time.monotonic() + delay >= ends_at:
+                    # waiting would overshoot the deadline, let the caller handle it
+                    return resp
+
+            attempt += 1
+            logger.info(f"retrying {method} {url} in {delay:.2f}s, {attempt=}")
+            time.sleep(delay)
+
+    def get(self, url: str, deadline: float | None = None, **kwargs):
+        return self.request("GET", url, deadline, **kwargs)
+
+    def post(self, url: str, deadline: float | None = None, **kwargs):
+        return self.request("POST", url, deadline, **kwargs)
+
+
+mal_client = MALClient()
@@ -1,5 +1,5 @@
 from flask_login import UserMixin
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -62,3 +62,26 @@ class AnimeGenre(Base):
     def __init__(self, anime_id, genre_id):
         self.anime_id = anime_id
         self.genre_id = genre_id
+
+
+class AnimeLookupMiss(Base):
+    """
+    Marks an anime whose genres couldn't be resolved from MAL, until `expires_at`.
+    """
+
+    __tablename__ = "anime_lookup_misses"
+
+    NOT_FOUND = "not_found"
+    NO_GENRES = "no_genres"
+
+    anime_id = Column(Integer, primary_key=True)
+    reason = Column(String(20))
+    expires_at = Column(DateTime, index=True)
+
+    def __init__(self, anime_id: int, reason: str, expires_at):
+        self.anime_id = anime_id
+        self.reason = reason
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"<AnimeLookupMiss {self.anime_id} {self.reason} {self.expires_at}>"
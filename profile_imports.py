@@ -0,0 +1,69 @@
+"""
+Profiles how long the entry points of the project take to import, run with
+`python profile_imports.py [module ...]`.
+
+Every module is imported in a fresh interpreter with `-X importtime`, the total import
+time is printed along with the slowest imports, so that subsystems which an entry point
+doesn't use but still pays for at startup stand out.
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# app is imported by the workers and by every flask CLI command
+ENTRY_POINTS = (
+    "app",
+    "recommendations.engine",
+    "recommendations.seeder",
+    "recommendations.scraper",
+)
+# how many of the slowest imports of every entry point are printed
+TOP_IMPORTS = 15
+
+
+def profile_import(module: str) -> tuple[float, list[tuple[int, int, str]]]:
+    """
+    Imports `module` in a new interpreter. Returns the wall time of the import in
+    seconds and the self and cumulative times, in microseconds, of every imported module.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return elapsed, imports
+
+
+def print_profile(module: str):
+    try:
+        elapsed, imports = profile_import(module)
+    except RuntimeError as e:
+        print(e)
+        return
+
+    print(f"{module}: {elapsed:.2f}s, {len(imports)} modules")
+    print(f"{'self ms':>10} {'cumul. ms':>10}  module")
+    slowest = sorted(imports, key=lambda i: i[1], reverse=True)[:TOP_IMPORTS]
+    for self_us, cumulative_us, name in slowest:
+        print(f"{self_us / 1e3:>10.1f} {cumulative_us / 1e3:>10.1f}  {name}")
+    print()
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or ENTRY_POINTS:
+        print_profile(module)
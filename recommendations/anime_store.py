@@ -1,24 +1,338 @@
+import json
+import logging
+import os
+import shutil
 from pathlib import Path
+from threading import Lock
 
-
+import numpy as np
 import pandas as pd
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:
+    # not on windows, where stores of older datasets are never removed
+    fcntl = None
 
+load_dotenv("./credentials.env")
 
 DATASET_FILE = "anime_data_cleaned.csv"
+# the dataset is converted to memory mapped columns kept here, relative to the project
+# directory, built again whenever the dataset file changes
+ANIME_STORE_DIR = os.getenv("ANIME_STORE_DIR", "./.anime_store")
+
+# bump when the layout of the built store changes
+ANIME_STORE_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+class StringColumn:
+    """
+    A column of strings kept as a heap of utf-8 bytes along with the offsets of every
+    string in it, both memory mapped. Strings are only decoded when accessed, and null
+    values are `None`.
+    """
+
+    def __init__(self, heap: np.ndarray, offsets: np.ndarray, nulls: np.ndarray | None):
+        self.heap = heap
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str | None:
+        if self.nulls is not None and self.nulls[position]:
+            return None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.heap[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def take(self, positions) -> np.ndarray:
+        """
+        Decodes the strings at the given positions into an object array, nulls become
+        `NaN` as in pandas.
+        """
+        values = np.array([self[int(i)] for i in positions], dtype=object)
+        if self.nulls is not None:
+            values[np.asarray(self.nulls)[positions]] = np.nan
+        return values
+
+    def to_numpy(self) -> np.ndarray:
+        """
+        Decodes the whole column into an object array, nulls become `NaN` as in pandas.
+        """
+        values = np.array(list(self), dtype=object)
+        if self.nulls is not None:
+            values[np.asarray(self.nulls)] = np.nan
+        return values
+
+
+def _write_string_column(directory: Path, name: str, values: pd.Series) -> dict:
+    nulls = values.isna().to_numpy()
+    encoded = [
+        b"" if null else str(v).encode("utf-8") for v, null in zip(values, nulls)
+    ]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    with open(directory / f"{name}.heap", "wb") as f:
+        for e in encoded:
+            f.write(e)
+    np.save(directory / f"{name}.offsets.npy", offsets)
+
+    column = {"kind": "string"}
+    if nulls.any():
+        np.save(directory / f"{name}.nulls.npy", nulls)
+        column["nulls"] = True
+    return column
+
+
+def build_store(df: pd.DataFrame, directory: Path, source: dict):
+    """
+    Writes every column of `df` to `directory`, numeric columns as `.npy` arrays and
+    the others as string heaps, along with the sorted ids and their positions to look
+    rows up by id. The manifest, written last, describes the columns.
+    """
+    directory.mkdir(parents=True)
+    ids = df["id"].to_numpy()
+    order = np.argsort(ids, kind="stable")
+    np.save(directory / "id.order.npy", order)
+    np.save(directory / "id.sorted.npy", ids[order])
+
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if pd.api.types.is_numeric_dtype(values):
+            np.save(directory / f"{name}.npy", values.to_numpy())
+            columns[name] = {"kind": "numeric"}
+        else:
+            columns[name] = _write_string_column(directory, name, values)
+
+    manifest = {
+        "version": ANIME_STORE_VERSION,
+        "source": source,
+        "rows": len(df),
+        "columns": columns,
+    }
+    with open(directory / "manifest.json", "w") as f:
+        json.dump(manifest, f)
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # running as another user
+        return True
+    return True
 
 
 class AnimeStore:
+    """
+    The anime dataset, as memory mapped columns shared by every process on the machine.
+
+    The first process to open the store after the dataset file changed converts it, the
+    others open the converted columns. Columns are mapped only once they are accessed,
+    so the ones which aren't used, like the synopsis, never take any memory.
+
+    Every process holds a shared lock on the manifest of the store it uses, stores of
+    older datasets are only removed once no process holds it anymore.
+    """
+
     instance = None
+    _instance_lock = Lock()
 
     def __new__(cls):
-        if cls.instance is None:
-            cls.instance = super().__new__(cls)
-        return cls.instance
+        with cls._instance_lock:
+            if cls.instance is None:
+                cls.instance = super().__new__(cls)
+            return cls.instance
 
     def __init__(self) -> None:
-        self.df = self._preprocess(
-            pd.read_csv(Path(__file__).parent.parent / DATASET_FILE)
+        # __init__ runs on every instantiation of the singleton, open the store once
+        with self._instance_lock:
+            if hasattr(self, "directory"):
+                return
+            self._columns: dict[str, np.ndarray | StringColumn] = {}
+            self._id_index: tuple[np.ndarray, np.ndarray] | None = None
+            self._df: pd.DataFrame | None = None
+            self._lock = Lock()
+            directory = self._open()
+            # held for as long as the process lives, see _remove_unused_stores
+            self._manifest_file = open(directory / "manifest.json", "rb")
+            if fcntl is not None:
+                fcntl.flock(self._manifest_file, fcntl.LOCK_SH)
+            self._remove_unused_stores(directory)
+            manifest = json.load(self._manifest_file)
+            self.rows: int = manifest["rows"]
+            self.column_kinds: dict[str, dict] = manifest["columns"]
+            self.directory = directory
+
+    @staticmethod
+    def _source_fingerprint(dataset: Path) -> dict:
+        stat = dataset.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _open(self) -> Path:
+        """
+        Returns the directory of the store built from the current dataset file, building
+        it first if there is none.
+        """
+        project = Path(__file__).parent.parent
+        dataset = project / DATASET_FILE
+        source = self._source_fingerprint(dataset)
+        root = project / ANIME_STORE_DIR
+        directory = (
+            root / f"v{ANIME_STORE_VERSION}-{source['size']}-{source['mtime_ns']}"
         )
+        if (directory / "manifest.json").exists():
+            return directory
+
+        logger.info(f"building the anime store in {directory}")
+        # built under another name first, readers never see a partial store
+        tmp_directory = directory.with_name(f"{directory.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        build_store(self._preprocess(pd.read_csv(dataset)), tmp_directory, source)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # another process built the same store meanwhile
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            if not (directory / "manifest.json").exists():
+                raise
+        return directory
+
+    @staticmethod
+    def _remove_unused_stores(directory: Path):
+        """
+        Removes the stores of older datasets which no process uses anymore, and the
+        partial stores of builds whose process is gone.
+        """
+        if fcntl is None:
+            return
+
+        for entry in directory.parent.iterdir():
+            if entry == directory:
+                continue
+            if entry.name.endswith(".tmp"):
+                # named <store>.<pid>.tmp, see _open
+                pid = entry.name.rsplit(".", 2)[-2]
+                if pid.isdigit() and not _process_exists(int(pid)):
+                    shutil.rmtree(entry, ignore_errors=True)
+                continue
+
+            try:
+                with open(entry / "manifest.json", "rb") as f:
+                    # fails while a process holds its shared lock
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    shutil.rmtree(entry, ignore_errors=True)
+            except BlockingIOError:
+                continue
+            except (FileNotFoundError, NotADirectoryError):
+                # not a store, or removed by another process meanwhile
+                continue
+
+    def column(self, name: str) -> np.ndarray | StringColumn:
+        """
+        Returns a column of the dataset, mapped the first time it is accessed.
+        Numeric columns are read only numpy arrays, the others are `StringColumn`s.
+        """
+        column = self._columns.get(name)
+        if column is not None:
+            return column
+
+        kind = self.column_kinds[name]
+        with self._lock:
+            if name in self._columns:
+                return self._columns[name]
+            if kind["kind"] == "numeric":
+                column = np.load(self.directory / f"{name}.npy", mmap_mode="r")
+            else:
+                nulls = None
+                if kind.get("nulls"):
+                    nulls = np.load(self.directory / f"{name}.nulls.npy", mmap_mode="r")
+                heap_path = self.directory / f"{name}.heap"
+                # an empty file can't be mapped
+                heap = (
+                    np.memmap(heap_path, dtype=np.uint8, mode="r")
+                    if heap_path.stat().st_size
+                    else np.zeros(0, dtype=np.uint8)
+                )
+                column = StringColumn(
+                    heap,
+                    np.load(self.directory / f"{name}.offsets.npy", mmap_mode="r"),
+                    nulls,
+                )
+            self._columns[name] = column
+        return column
+
+    def positions(self, ids) -> np.ndarray:
+        """
+        Returns the row positions of the given anime, in the order of `ids`. Anime which
+        aren't in the dataset are left out.
+        """
+        if self._id_index is None:
+            self._id_index = (
+                np.load(self.directory / "id.sorted.npy", mmap_mode="r"),
+                np.load(self.directory / "id.order.npy", mmap_mode="r"),
+            )
+        sorted_ids, order = self._id_index
+        if len(sorted_ids) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        ids = np.asarray(ids, dtype=sorted_ids.dtype)
+        found = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return np.asarray(order[found[sorted_ids[found] == ids]])
+
+    def get_many(self, ids, columns: list[str]) -> dict[str, np.ndarray]:
+        """
+        Returns the given columns of the rows of the given anime, in the order of `ids`.
+        Anime which aren't in the dataset are left out. Only the requested rows are
+        read, string columns are object arrays like in pandas.
+        """
+        positions = self.positions(ids)
+        rows = {}
+        for name in columns:
+            column = self.column(name)
+            if isinstance(column, StringColumn):
+                rows[name] = column.take(positions)
+            else:
+                rows[name] = np.asarray(column[positions])
+        return rows
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.column_kinds)
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """
+        The whole dataset as a dataframe, every column is decoded the first time.
+        Prefer `column` when only some columns are needed.
+        """
+        if self._df is None:
+            data = {}
+            for name in self.columns:
+                column = self.column(name)
+                if isinstance(column, StringColumn):
+                    data[name] = column.to_numpy()
+                else:
+                    # copied, the mapped arrays are read only
+                    data[name] = np.array(column)
+            df = pd.DataFrame(data)
+            with self._lock:
+                if self._df is None:
+                    self._df = df
+        return self._df
 
     @staticmethod
     def _preprocess(df: pd.DataFrame):
@@ -37,5 +351,8 @@ class AnimeStore:
         ]
         for col in textcols:
             df[col] = df[col].fillna("")
+        # not in the datasets cleaned before it was kept
+        if "explicit_genres" in df:
+            df["explicit_genres"] = df["explicit_genres"].fillna("")
 
         return df
@@ -1,11 +1,17 @@
-from fastembed import TextEmbedding
+# the model anime are embedded with and the size of its embeddings, which is known
+# beforehand so that the model doesn't have to be loaded to know it
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+EMBEDDING_SIZE = 384
 
 
 class EmbeddingGenerator:
     def __init__(self, parallel: int = 8, batch_size: int = 128) -> None:
+        # fastembed pulls in onnxruntime, only import it when something is embedded
+        from fastembed import TextEmbedding
+
         self.parallel = parallel
         self.batch_size = batch_size
-        self.model = TextEmbedding(model_name="BAAI/bge-small-en-v1.5", lazy_load=True)
+        self.model = TextEmbedding(model_name=EMBEDDING_MODEL, lazy_load=True)
 
     def embed_docs(self, docs: list[str]):
         return list(
@@ -38,4 +44,6 @@ class EmbeddingGenerator:
 
 
 if __name__ == "__main__":
-    print(EmbeddingGenerator().model.embedding_size)
+    embedding_size = EmbeddingGenerator().model.embedding_size
+    print(embedding_size)
+    assert embedding_size == EMBEDDING_SIZE, "EMBEDDING_SIZE doesn't match the model"
@@ -2,17 +2,18 @@ from collections import Counter
 from dataclasses import dataclass, asdict
 from datetime import date
 import math
-from typing import NamedTuple
+from threading import Lock
+from typing import TYPE_CHECKING, NamedTuple
 
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import normalize
 
 
 from recommendations.anime_store import AnimeStore
-from recommendations.embed import EmbeddingGenerator
-from recommendations.qdrant_store import QdrantStore
+from recommendations.embed import EMBEDDING_SIZE
+
+if TYPE_CHECKING:
+    from recommendations.qdrant_store import QdrantStore
 
 
 CANDIDATE_SET_SIZE = 300
@@ -119,21 +120,47 @@ class RecommendationOpts:
 
 
 class RecommendationEngine:
+    """
+    Recommends anime similar to those of a userlist. The dataset is loaded and Qdrant is
+    connected to on the first recommendation, not when the engine is created, so that
+    processes which never recommend anything don't pay for them.
+    """
+
     def __init__(self) -> None:
-        self.embedgen = EmbeddingGenerator()
-        self.qdrant_store = QdrantStore()
-        self.anime_store = AnimeStore()
+        self._lock = Lock()
+        self._qdrant_store: "QdrantStore | None" = None
+        self._anime_store: AnimeStore | None = None
+
+    @property
+    def qdrant_store(self) -> "QdrantStore":
+        if self._qdrant_store is None:
+            with self._lock:
+                if self._qdrant_store is None:
+                    # qdrant_client is slow to import
+                    from recommendations.qdrant_store import QdrantStore
+
+                    self._qdrant_store = QdrantStore()
+        return self._qdrant_store
+
+    @property
+    def anime_store(self) -> AnimeStore:
+        if self._anime_store is None:
+            with self._lock:
+                if self._anime_store is None:
+                    self._anime_store = AnimeStore()
+        return self._anime_store
 
     def _retrieve(self, userlist: pd.DataFrame, opts: RecommendationOpts):
+        # sklearn is slow to import and only needed here
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import normalize
+
         # the fields are in parity with those defined in api_helper.py
         userlist_ids = (userlist["series_animedb_id"]).to_list()
 
-        userlist_df = self.anime_store.df[self.anime_store.df["id"].isin(userlist_ids)]
-        userlist_df_rows = userlist_df.to_dict(orient="records")
-
-        if not userlist_df_rows:
-            embedding_size = self.embedgen.model.embedding_size
-            fallback_vector = np.random.random(embedding_size)
+        if len(self.anime_store.positions(userlist_ids)) == 0:
+            # none of the anime of the list are known, recommend from a random vector
+            fallback_vector = np.random.random(EMBEDDING_SIZE)
             return [
                 (AnimePayload.from_dict(r.payload), r.score)
                 for r in self.qdrant_store.search_similar_anime(
@@ -204,8 +231,8 @@ class RecommendationEngine:
             "Dropped": 0.2,
         }
         userlist["score_weight"] = (userlist["my_score"] / 10) ** 2
-        userlist["status_weight"] = userlist["my_status"].apply(
-            lambda x: status_weights.get(x, 0)
+        userlist["status_weight"] = (
+            userlist["my_status"].map(status_weights).astype(float).fillna(0)
         )
 
         # using guassian decay for calculating recency weight
@@ -377,30 +404,18 @@ class RecommendationEngine:
 
     @staticmethod
     def _prepare_userlist_df(df: pd.DataFrame):
-        # fill NaN scores with 0
-        df["my_score"] = df["my_score"].fillna(0)
-        df["my_watched_episodes"] = df["my_watched_episodes"].fillna(0).astype(float)
-        df["series_episodes"] = df["series_episodes"].fillna(0).astype(float)
-
+        """
+        Takes a dataframe prepared by `userlist.prepare_userlist_df` and adds the
+        engine specific columns to it.
+        """
         # Resolve a single date column with priority:
         # finish_date -> watching(today) -> start_date -> 2000-01-01.
-        finish_dates = df["my_finish_date"].fillna("0000-00-00").astype(str)
-        start_dates = df["my_start_date"].fillna("0000-00-00").astype(str)
-        watching = df["my_status"].astype(str).eq("Watching")
-        today_str = date.today().isoformat()
-
-        resolved_dates = np.where(
-            finish_dates != "0000-00-00",
-            finish_dates,
-            np.where(
-                watching,
-                today_str,
-                np.where(start_dates != "0000-00-00", start_dates, "2000-01-01"),
-            ),
-        )
-
-        df["my_date"] = pd.to_datetime(resolved_dates, errors="coerce").fillna(
-            pd.Timestamp("2000-01-01")
+        watching = df["my_status"] == "Watching"
+        fallback_dates = df["my_start_date"].mask(watching, pd.Timestamp(date.today()))
+        df["my_date"] = (
+            df["my_finish_date"]
+            .fillna(fallback_dates)
+            .fillna(pd.Timestamp("2000-01-01"))
         )
 
         # drop PTW entries
@@ -4,9 +4,7 @@ import os
 import numpy as np
 from qdrant_client import QdrantClient, models
 
-from recommendations.embed import EmbeddingGenerator
-
-_EMBEDDING_SIZE = EmbeddingGenerator().model.embedding_size
+from recommendations.embed import EMBEDDING_SIZE
 
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
@@ -47,7 +45,7 @@ class QdrantStore:
         self.client.create_collection(
             QDRANT_COLLECTION,
             models.VectorParams(
-                size=_EMBEDDING_SIZE,
+                size=EMBEDDING_SIZE,
                 distance=models.Distance.COSINE,
                 hnsw_config=models.HnswConfigDiff(m=0),
                 on_disk=True,
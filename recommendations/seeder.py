@@ -31,18 +31,28 @@ class QdrantSeeder:
         for idx in range(0, len(items), batch_size):
             yield items[idx : idx + batch_size]
 
+    def _rows(self, ids: list[int]) -> list[dict]:
+        """
+        Returns the rows of the given anime as dictionaries of every column.
+        """
+        columns = self.anime_store.columns
+        values = self.anime_store.get_many(ids, columns)
+        return [
+            dict(zip(columns, row))
+            for row in zip(*(values[name].tolist() for name in columns))
+        ]
+
     def seed(self):
-        df = self.anime_store.df
-        alr_uploaded = self.qdrant_store.get_uploaded_point_ids(df.shape[0])
-        all_ids = set(df["id"])
-        to_seed = all_ids - alr_uploaded
+        all_ids = self.anime_store.column("id").tolist()
+        alr_uploaded = self.qdrant_store.get_uploaded_point_ids(len(all_ids))
+        # in the order of the dataset
+        to_seed = [i for i in all_ids if i not in alr_uploaded]
         logger.info(f"Starting seeding of {len(to_seed)} documents.")
         if not to_seed:
             logger.info("No new documents to seed.")
             return
 
-        df_to_seed = df[df["id"].isin(to_seed)]
-        rows = df_to_seed.to_dict(orient="records")
+        rows = self._rows(to_seed)
         batch_size = max(1, self.embedgen.batch_size)
         total = len(rows)
         total_batches = (total + batch_size - 1) // batch_size
@@ -74,8 +74,22 @@ function snakeCase(text) {
 	return snake;
 }
 
+// see IMAGE_MIMETYPES in visualizer/figures.py
+const imageMimetypes = {
+	"png": "image/png",
+	"webp": "image/webp",
+	"svg": "image/svg+xml",
+};
+
+function _imageSource(result) {
+	// images served from the chart store are fetched by the browser, others are inlined
+	if (result.url) {
+		return result.url;
+	}
+	return `data:${imageMimetypes[result.format]};base64,` + result.image;
+}
+
 function _createMatplotlibAccordion(result) {
-	let b64image = result.image;
 	let title = result.title;
 
 	let details = document.createElement("details");
@@ -86,13 +100,13 @@ function _createMatplotlibAccordion(result) {
 	summary.role = "button";
 	summary.innerText = title;
 	let img = document.createElement("img");
-	img.src = "data:image/png;base64," + b64image;
+	img.src = _imageSource(result);
 	img.classList.add("graph-image");
 
 	let downloadBtn = document.createElement("a");
 	downloadBtn.role = "button";
 	downloadBtn.href = img.src;
-	downloadBtn.download = snakeCase(title + ".png");
+	downloadBtn.download = snakeCase(`${title}.${result.format}`);
 	downloadBtn.textContent = "Download";
 	downloadBtn.classList.add("outline");
 
@@ -104,10 +118,76 @@ function _createMatplotlibAccordion(result) {
 	return details;
 }
 
+// the plotly template compact figures refer to, sent once per response
+var plotlyTemplate = null;
+
 function _createPlotlyAccordion(result) {
-	const title = result.title;
-	let snakeTitle = snakeCase(title);
 	const figure = JSON.parse(result.figure);
+	if (result.template && plotlyTemplate) {
+		figure.layout.template = plotlyTemplate;
+	}
+	return _createPlotlyFigureAccordion(result.title, figure.data, figure.layout);
+}
+
+function _plotlyTracesFromData(result) {
+	// see ChartSpec in visualizer/drivers/base.py
+	const chart = result.chart;
+	const names = Object.keys(result.series);
+	const color = (i) => chart.colors.length ? chart.colors[i % chart.colors.length] : undefined;
+
+	if (chart.kind == "pie") {
+		return [{
+			type: "pie",
+			labels: result.labels,
+			values: result.series[names[0]],
+			hole: chart.hole,
+			textposition: "inside",
+			textinfo: "percent+label",
+		}];
+	}
+
+	const horizontal = chart.kind == "hbar";
+	let traces = names.map((name, i) => ({
+		type: "bar",
+		name: name,
+		x: horizontal ? result.series[name] : result.labels,
+		y: horizontal ? result.labels : result.series[name],
+		orientation: horizontal ? "h" : "v",
+		marker: { color: color(i) },
+		showlegend: names.length > 1,
+	}));
+
+	if (chart.kind == "bar_line") {
+		traces[0].marker = { color: "skyblue" };
+		traces[0].opacity = 0.7;
+		traces.push({
+			type: "scatter",
+			mode: "lines",
+			x: result.labels,
+			y: result.series[names[0]],
+			showlegend: false,
+		});
+	}
+	return traces;
+}
+
+function _createDataAccordion(result) {
+	const chart = result.chart;
+	const layout = {
+		title: { text: result.title },
+		barmode: "stack",
+		xaxis: { title: { text: chart.x_title }, type: "category" },
+		yaxis: { title: { text: chart.y_title } },
+	};
+	if (chart.kind == "hbar") {
+		layout.xaxis.type = "-";
+		layout.yaxis.type = "category";
+	}
+	return _createPlotlyFigureAccordion(result.title, _plotlyTracesFromData(result), layout);
+}
+
+function _createPlotlyFigureAccordion(title, data, layout) {
+	let snakeTitle = snakeCase(title);
 
 	let details = document.createElement("details");
 
@@ -120,7 +200,7 @@ function _createPlotlyAccordion(result) {
 	let renderContainer = document.createElement("div");
 	renderContainer.setAttribute("id", snakeTitle);
 	// console.log(figure)
-	Plotly.newPlot(renderContainer, figure.data, figure.layout, {
+	Plotly.newPlot(renderContainer, data, layout, {
 		toImageButtonOptions: {
 			format: 'png', // one of png, svg, jpeg, webp
 			filename: snakeTitle,
@@ -138,7 +218,10 @@ function _createPlotlyAccordion(result) {
 }
 
 function createChartAccordion(result) {
-	if (result.interactive) {
+	if (result.data_only) {
+		// only the data was sent, draw the chart here
+		return _createDataAccordion(result.result)
+	} else if (result.interactive) {
 		// plotly has been used
 		return _createPlotlyAccordion(result.result)
 	} else {
@@ -167,14 +250,14 @@ function createErrorModal(heading, content) {
 	});
 }
 
-function blobFromBase64String(base64String) {
+function blobFromBase64String(base64String, type) {
 	const byteCharacters = atob(base64String);
 	const byteNumbers = new Array(byteCharacters.length);
 	for (let i = 0; i < byteCharacters.length; i++) {
 		byteNumbers[i] = byteCharacters.charCodeAt(i);
 	}
 	const byteArray = new Uint8Array(byteNumbers);
-	const blob = new Blob([byteArray], { type: "image/png" });
+	const blob = new Blob([byteArray], { type: type });
 	return blob;
 }
 
@@ -256,9 +339,13 @@ async function downloadAll(results) {
 
 		for (const result of results) {
 			const title = result.title;
-			const img = result.image;
-			const blob = blobFromBase64String(img);
-			zip.file(`${snakeCase(title)}.png`, blob, { base64: true });
+			let blob;
+			if (result.url) {
+				blob = await fetch(result.url).then((resp) => resp.blob());
+			} else {
+				blob = blobFromBase64String(result.image, imageMimetypes[result.format]);
+			}
+			zip.file(`${snakeCase(title)}.${result.format}`, blob, { base64: true });
 		}
 		const content = await zip.generateAsync({ type: "blob" });
 		const fileStream = streamSaver.createWriteStream("animeviz_insights.zip", {
@@ -283,6 +370,91 @@ async function downloadAll(results) {
 	return downloadAllBtn;
 }
 
+function appendDownloadAll(container, results) {
+	downloadAll(results)
+		.then((downloadAllBtn) => {
+			container.appendChild(downloadAllBtn);
+		})
+		.catch((err) => {
+			// alert("unable to make a zip file");
+			createErrorModal("Unable to make a zip file!", "We're unable to make a zip file of all the images. Please try again later.");
+			console.log(err);
+		});
+}
+
+async function* ndjsonMessages(response) {
+	const reader = response.body.getReader();
+	const decoder = new TextDecoder();
+	let buffered = "";
+	while (true) {
+		const { done, value } = await reader.read();
+		if (done) {
+			break;
+		}
+		buffered += decoder.decode(value, { stream: true });
+		const lines = buffered.split("\n");
+		// the last line is incomplete until a newline arrives
+		buffered = lines.pop();
+		for (const line of lines) {
+			if (line.trim()) {
+				yield JSON.parse(line);
+			}
+		}
+	}
+	if (buffered.trim()) {
+		yield JSON.parse(buffered);
+	}
+}
+
+function insertChartAccordion(container, accordion, index) {
+	// results arrive in the order they're drawn, show them in the order of the charts
+	accordion.dataset.index = index;
+	const next = Array.from(container.querySelectorAll(":scope > details[data-index]"))
+		.find((elem) => Number(elem.dataset.index) > index);
+	container.insertBefore(accordion, next || null);
+}
+
+async function renderResultStream(response) {
+	// see stream_visualization in app.py for the messages
+	let container = null;
+	let results = [];
+	try {
+		for await (const message of ndjsonMessages(response)) {
+			if (!container) {
+				deleteForm();
+				container = document.querySelector(".form-container");
+			}
+
+			if (message.type == "summary") {
+				plotlyTemplate = message.plotly_template;
+				if (message.summary) {
+					container.appendChild(createSummarySection(message.summary));
+				}
+			} else if (message.type == "result") {
+				results[message.index] = message.result;
+				insertChartAccordion(container, createChartAccordion(message.result), message.index);
+			} else if (message.type == "done" && !message.success) {
+				createErrorModal("Unable to visualize all of your data!", `The server didn't respond with a successfull response: ${message.message}`);
+			}
+		}
+	} catch (err) {
+		console.log("the stream of results was interrupted");
+		console.log(err);
+		createErrorModal("Unable to visualize!", "The connection to our server was interrupted. Please try again later.");
+		if (!container) {
+			restoreForm();
+			return;
+		}
+	}
+
+	if (!container) {
+		createErrorModal("Unable to visualize!", "The server didn't send any results. Please try again later.");
+		restoreForm();
+		return;
+	}
+	appendDownloadAll(container, results.filter((r) => r));
+}
+
 async function sendVisualizationRequest() {
 	if (!captchaWidgetID) {
 		createErrorModal("Captcha not loaded!", "Unable to load the captcha. Please try reloading the webpage.");
@@ -314,9 +486,14 @@ async function sendVisualizationRequest() {
 	// fetch form data and post it
 	let disableNSFW = document.getElementById("nsfw");
 	let interactiveCharts = document.getElementById("interactive");
+	let browserCharts = document.getElementById("browser");
 	const data = {
 		"disable_nsfw": disableNSFW.checked,
-		"interactive_charts": interactiveCharts.checked
+		"interactive_charts": interactiveCharts.checked,
+		"data_only": browserCharts.checked,
+		"image_urls": true,
+		"compact_figures": true,
+		"stream": true
 	}
 	let formdata = new FormData();
 	for (const key in data) {
@@ -337,6 +514,11 @@ async function sendVisualizationRequest() {
 		body: formdata
 	})
 		.then(response => {
+			if (response.headers.get("Content-Type")?.startsWith("application/x-ndjson")) {
+				// the results are streamed as they're drawn
+				renderResultStream(response);
+				return;
+			}
 			response.json().then(
 				jsonResp => {
 
@@ -348,6 +530,7 @@ async function sendVisualizationRequest() {
 					}
 					deleteForm();
 					let container = document.querySelector(".form-container");
+					plotlyTemplate = jsonResp.plotly_template;
 
 					if (jsonResp.summary) {
 						const summarySection = createSummarySection(jsonResp.summary);
@@ -359,15 +542,7 @@ async function sendVisualizationRequest() {
 						container.appendChild(accordion);
 					});
 
-					downloadAll(jsonResp.results)
-						.then((downloadAllBtn) => {
-							container.appendChild(downloadAllBtn);
-						})
-						.catch((err) => {
-							// alert("unable to make a zip file");
-							createErrorModal("Unable to make a zip file!", "We're unable to make a zip file of all the images. Please try again later.");
-							console.log(err);
-						});
+					appendDownloadAll(container, jsonResp.results);
 				}
 			).catch(err => {
 				console.log("cannot convert response to json");
@@ -95,6 +95,54 @@ function createRecCard(rec) {
 	return card;
 }
 
+function sleep(ms) {
+	return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+async function waitForJob(jobId) {
+	// polls the job until it's done or failed, see /jobs/<job_id> in app.py
+	let delay = 1000;
+	while (true) {
+		await sleep(delay);
+		const resp = await fetch(`/jobs/${jobId}`);
+		if (resp.status == 429) {
+			// rate limited, poll less often
+			delay = Math.min(delay * 2, 16000);
+			continue;
+		}
+		if (!resp.ok && resp.status != 404) {
+			return { success: false, message: `Checking the progress failed (${resp.status}).` };
+		}
+		delay = 1000;
+		const jobResp = await resp.json();
+		if (jobResp.status == "done") {
+			return jobResp.response;
+		}
+		if (!jobResp.success) {
+			return jobResp;
+		}
+	}
+}
+
+function showRecommendations(jsonResp) {
+	if (!jsonResp.success) {
+		createErrorModal("Unable to get recommendations!", "The server didn't respond with a successful response: " + (jsonResp.message || "unknown error"));
+		restoreForm();
+		return;
+	}
+	deleteForm();
+	let container = document.querySelector("#results-container");
+	container.style.display = "flex";
+
+	let grid = document.querySelector("#recs-grid");
+	grid.innerHTML = "";
+
+	jsonResp.results.forEach(rec => {
+		const card = createRecCard(rec);
+		grid.appendChild(card);
+	});
+}
+
 async function sendRecommendationRequest() {
 	if (!captchaWidgetID) {
 		createErrorModal("Captcha not loaded!", "Unable to load the captcha. Please try reloading the webpage.");
@@ -129,6 +177,8 @@ async function sendRecommendationRequest() {
 	}
 
 	formdata.append("cf-turnstile-response", turnstile.getResponse());
+	// the recommendations are generated in the background, poll for them
+	formdata.append("async", "true");
 
 	turnstile.remove();
 
@@ -143,23 +193,11 @@ async function sendRecommendationRequest() {
 	})
 		.then(response => {
 			response.json().then(
-				jsonResp => {
-					if (!jsonResp.success) {
-						createErrorModal("Unable to get recommendations!", "The server didn't respond with a successful response: " + (jsonResp.message || "unknown error"));
-						restoreForm();
-						return;
+				async jsonResp => {
+					if (jsonResp.job_id) {
+						jsonResp = await waitForJob(jsonResp.job_id);
 					}
-					deleteForm();
-					let container = document.querySelector("#results-container");
-					container.style.display = "flex";
-
-					let grid = document.querySelector("#recs-grid");
-					grid.innerHTML = "";
-
-					jsonResp.results.forEach(rec => {
-						const card = createRecCard(rec);
-						grid.appendChild(card);
-					});
+					showRecommendations(jsonResp);
 				}
 			).catch(err => {
 				console.log("cannot convert response to json");
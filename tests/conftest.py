@@ -0,0 +1,40 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# the settings the modules read when imported, no service is connected to
+for name, value in {
+    "MYSQL_USERNAME": "animeviz",
+    "MYSQL_PASSWORD": "animeviz",
+    "MYSQL_HOST": "localhost",
+    "MYSQL_PORT": "3306",
+    "DB_POOL_SIZE": "1",
+    "DB_POOL_RECYCLE": "3600",
+    "MAX_ANIME_SEARCH_THREADS": "4",
+    "MAL_CLIENT_ID": "animeviz",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def anime_store(tmp_path, monkeypatch):
+    """
+    Returns a function opening an `AnimeStore` built from the given dataframe instead
+    of the dataset of the project.
+    """
+    from recommendations import anime_store
+
+    def open_store(df):
+        dataset = tmp_path / "anime_data_cleaned.csv"
+        df.to_csv(dataset, index=False)
+        monkeypatch.setattr(anime_store, "DATASET_FILE", str(dataset))
+        monkeypatch.setattr(anime_store, "ANIME_STORE_DIR", str(tmp_path / "store"))
+        monkeypatch.setattr(anime_store.AnimeStore, "instance", None)
+        return anime_store.AnimeStore()
+
+    yield open_store
+    monkeypatch.setattr(anime_store.AnimeStore, "instance", None)
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from visualizer.aggregates import UserlistAggregator
+from visualizer.benchmarks import PX_FIGURES, synthetic_userlist
+from visualizer.drivers.base import PlotlyVisualizationResult, VisualizationOptions
+
+
+@pytest.fixture(scope="module")
+def userlist():
+    return synthetic_userlist(500)
+
+
+@pytest.mark.parametrize("compact", [False, True], ids=["full", "compact"])
+@pytest.mark.parametrize(
+    "driver_cls, px_figure", PX_FIGURES, ids=[d.name for d, _ in PX_FIGURES]
+)
+def test_figure_spec_matches_plotly_express(userlist, driver_cls, px_figure, compact):
+    opts = VisualizationOptions(
+        disable_nsfw=False,
+        count_upcoming=False,
+        interactive_charts=True,
+        compact_figures=compact,
+    )
+    data = getattr(UserlistAggregator(userlist, opts).aggregate(), driver_cls.name)
+
+    spec = driver_cls(data, opts).visualize().as_dict()
+    expected = PlotlyVisualizationResult(
+        spec["title"], px_figure(data), compact=compact
+    ).as_dict()
+    assert json.loads(spec.pop("figure")) == json.loads(expected.pop("figure"))
+    assert spec == expected
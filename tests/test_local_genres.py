@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from visualizer import api_helper
+
+
+def dataset(**columns) -> pd.DataFrame:
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "title": ["Isekai Ecchi", "Action", "Nothing"],
+            "start_date": ["2020-01-01", None, None],
+            "end_date": [None, None, None],
+            "synopsis": ["", "", ""],
+            "genres": ["Fantasy|Romance", "Action|Award Winning", None],
+            "explicit_genres": ["Ecchi", None, None],
+            "themes": ["Isekai|Harem", None, "Music"],
+            "demographics": [None, None, None],
+            "studios": [None, None, None],
+            "related_anime": [None, None, None],
+            "alt_title_en": [None, None, None],
+            "alt_title_jp": [None, None, None],
+        }
+    )
+    return df.drop(columns=[name for name, kept in columns.items() if not kept])
+
+
+@pytest.fixture(autouse=True)
+def fresh_local_store():
+    api_helper._local_anime_store.cache_clear()
+    yield
+    api_helper._local_anime_store.cache_clear()
+
+
+def test_themes_and_explicit_genres_are_resolved(anime_store):
+    anime_store(dataset())
+
+    assert api_helper._anime_genres_local([1, 2, 3, 4]) == {
+        1: ["Fantasy", "Romance", "Ecchi", "Isekai"],
+        2: ["Action"],
+        3: [],
+    }
+
+
+def test_bulk_lookup_of_local_anime(anime_store):
+    anime_store(dataset())
+
+    genres = api_helper.get_anime_genres_bulk(pd.Series([3, 1, 1]), max_workers=1)
+    isekai_ecchi = ["Fantasy", "Romance", "Ecchi", "Isekai"]
+    assert genres == [[], isekai_ecchi, isekai_ecchi]
+
+
+def test_dataset_without_explicit_genres_isnt_used(anime_store):
+    anime_store(dataset(explicit_genres=False))
+
+    assert api_helper._anime_genres_local([1, 2, 3]) == {}
@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pandas as pd
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+# warms the recommendations up like the gunicorn master, then fits a KMeans in a
+# forked child like a worker would
+FORK_AFTER_WARM_UP = textwrap.dedent(
+    """
+    import os
+    import signal
+    import sys
+    import time
+
+    import numpy as np
+    from sklearn.cluster import KMeans
+
+    from recommendations import anime_store
+    from recommendations.engine import RecommendationEngine
+    from warmup import warm_up_recommendations
+
+    anime_store.DATASET_FILE, anime_store.ANIME_STORE_DIR = sys.argv[1:3]
+    engine = RecommendationEngine()
+    warm_up_recommendations(engine)
+
+    pid = os.fork()
+    if pid == 0:
+        points = np.random.default_rng(0).random((1000, 16))
+        KMeans(4, n_init=2, init="k-means++").fit(points)
+        os._exit(0)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            sys.exit(os.waitstatus_to_exitcode(status))
+        time.sleep(0.1)
+    # deadlocked
+    os.kill(pid, signal.SIGKILL)
+    sys.exit(124)
+    """
+)
+
+
+def test_kmeans_runs_in_workers_forked_after_warm_up(tmp_path):
+    dataset = tmp_path / "anime_data_cleaned.csv"
+    pd.DataFrame(
+        {
+            "id": [1],
+            **{
+                name: [""]
+                for name in (
+                    "start_date",
+                    "end_date",
+                    "synopsis",
+                    "genres",
+                    "explicit_genres",
+                    "themes",
+                    "demographics",
+                    "studios",
+                    "related_anime",
+                    "alt_title_en",
+                    "alt_title_jp",
+                )
+            },
+        }
+    ).to_csv(dataset, index=False)
+
+    # libgomp's thread pool is only started by a parallel region with several threads
+    env = {**os.environ, "OMP_NUM_THREADS": "4"}
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            FORK_AFTER_WARM_UP,
+            str(dataset),
+            str(tmp_path / "store"),
+        ],
+        cwd=PROJECT_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
@@ -0,0 +1,66 @@
+import hashlib
+
+import pandas as pd
+
+# MAL marks missing dates with this in exported lists, the API helper does the same
+MISSING_DATE = "0000-00-00"
+
+LIST_STATUSES = ("Watching", "Completed", "On-Hold", "Dropped", "Plan to Watch")
+
+# the columns of an animelist used by the visualizer and the recommendation engine
+PREPARED_DTYPES = {
+    "series_animedb_id": "int32",
+    "series_title": "object",
+    "series_type": "category",
+    "series_episodes": "int32",
+    "my_watched_episodes": "int32",
+    "my_start_date": "datetime64[ns]",
+    "my_finish_date": "datetime64[ns]",
+    "my_score": "int8",
+    "my_status": pd.CategoricalDtype(LIST_STATUSES),
+}
+
+
+def _parse_dates(col: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    col = col.astype("object").where(col.notna() & (col != MISSING_DATE))
+    # partial dates like 2020-05-00 can't be parsed either, treat them as missing
+    return pd.to_datetime(col, format="ISO8601", errors="coerce")
+
+
+def prepare_userlist_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Takes an animelist dataframe, built from an exported animelist or from the MAL API,
+    and returns a new one containing only the columns in `PREPARED_DTYPES`, with compact
+    dtypes. Missing dates become `NaT`, missing numbers become 0.
+    Preparing an already prepared dataframe returns an equal one.
+    """
+    df = df.reindex(columns=list(PREPARED_DTYPES.keys()))
+
+    prepared = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    prepared["series_animedb_id"] = df["series_animedb_id"].to_numpy(dtype="int32")
+    prepared["series_title"] = df["series_title"].fillna("").astype(str).to_numpy()
+    prepared["series_type"] = pd.Categorical(
+        df["series_type"].astype("object").fillna("Unknown").astype(str)
+    )
+    for col in ("series_episodes", "my_watched_episodes", "my_score"):
+        prepared[col] = (
+            df[col].fillna(0).to_numpy().astype(PREPARED_DTYPES[col], copy=False)
+        )
+    for col in ("my_start_date", "my_finish_date"):
+        prepared[col] = _parse_dates(df[col]).to_numpy()
+    prepared["my_status"] = pd.Categorical(
+        df["my_status"].astype("object"), dtype=PREPARED_DTYPES["my_status"]
+    )
+
+    return prepared[list(PREPARED_DTYPES.keys())]
+
+
+def userlist_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Returns a stable hash of the contents of a prepared animelist. Lists with the same
+    entries have the same fingerprint, regardless of how they were submitted.
+    """
+    rows = pd.util.hash_pandas_object(df[list(PREPARED_DTYPES.keys())], index=False)
+    return hashlib.blake2b(rows.to_numpy().tobytes(), digest_size=16).hexdigest()
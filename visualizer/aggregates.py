@@ -0,0 +1,398 @@
+import logging
+from dataclasses import dataclass, fields
+from datetime import date
+from functools import cached_property
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from .drivers.base import ChartSeries, IVisualizationDriver, VisualizationOptions
+from .genres import GENRES, genre_columns, genre_matrix
+
+# scores are banded into bad [1, 4], average [5, 7] and good [8, 10], 0 means unscored
+RATING_BANDS = ("bad", "average", "good")
+RATING_BAND_EDGES = (0, 4, 7, 10)
+
+COUR_SEASONS = ("Winter", "Spring", "Summer", "Fall")
+
+# series types which aren't counted in the format distribution
+IGNORED_FORMATS = ("PV", "Music", "Unknown")
+
+
+@dataclass(frozen=True)
+class Aggregates:
+    """
+    The data of every chart and the summary of an animelist.
+    A chart is `None` when there isn't enough data to draw it.
+    """
+
+    monthwise_count: ChartSeries | None
+    courwise_ratings: ChartSeries | None
+    genre_distribution: ChartSeries | None
+    genrewise_ratings: ChartSeries | None
+    ratings_curve: ChartSeries | None
+    remaining_watching: ChartSeries | None
+    format_distribution: ChartSeries | None
+    status_distribution: ChartSeries | None
+    fastest_finished: ChartSeries | None
+    summary: dict
+
+
+# the names of the charts, in the order they are drawn in
+CHARTS = tuple(f.name for f in fields(Aggregates) if f.name != "summary")
+
+
+def trim_anime_title(name: str, max_name_length: int = 10):
+    return name[: max_name_length + 1] + "..."
+
+
+def _days_in_month(months: np.ndarray) -> np.ndarray:
+    """
+    Returns the number of days in each of the `datetime64[M]` months.
+    """
+    return ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(
+        np.int64
+    )
+
+
+def monthwise_episode_counts(
+    start: np.ndarray, finish: np.ndarray, watched: np.ndarray, today: date
+) -> pd.Series:
+    """
+    Spreads the watched episodes of every entry evenly across the days between its start
+    and finish date (today if it isn't finished yet), and returns the number of episodes
+    watched in each month, indexed by monthly periods in ascending order.
+
+    An entry started and finished in the same month counts entirely towards that month.
+    Otherwise every month gets the episodes of the days spent in it, truncated to an integer.
+    The months in which anime were started are always present, even if zero.
+    """
+    start = start.astype("datetime64[D]")
+    finish = finish.astype("datetime64[D]")
+    end = np.where(np.isnat(finish), np.datetime64(today, "D"), finish)
+    lo, hi = np.minimum(start, end), np.maximum(start, end)
+    lo_month, hi_month = lo.astype("datetime64[M]"), hi.astype("datetime64[M]")
+
+    # months are counted in slots relative to the earliest one
+    base = lo_month.min()
+    size = int((hi_month.max() - base).astype(np.int64)) + 1
+
+    def slot(months):
+        return (months - base).astype(np.int64)
+
+    present = np.zeros(size, dtype=bool)
+    present[slot(start.astype("datetime64[M]"))] = True
+
+    same = lo_month == hi_month
+    counts = np.zeros(size)
+    counts += np.bincount(slot(lo_month[same]), weights=watched[same], minlength=size)
+
+    # one element per (entry, month) pair of the entries spanning several months
+    multi = ~same
+    lo, hi, watched = lo[multi], hi[multi], watched[multi]
+    lo_month, hi_month = lo_month[multi], hi_month[multi]
+    spans = (hi_month - lo_month).astype(np.int64) + 1
+    entry = np.repeat(np.arange(len(spans)), spans)
+    nth = np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+    months = lo_month[entry] + nth
+
+    # the days after the start date in its month, whole months in between
+    # and the days up to the end date in its month
+    lo_day = (lo - lo_month).astype(np.int64) + 1
+    hi_day = (hi - hi_month).astype(np.int64) + 1
+    days = _days_in_month(months)
+    first, last = nth == 0, nth == spans[entry] - 1
+    days[first] -= lo_day
+    days[last] = hi_day
+
+    episodes_per_day = watched / (hi - lo).astype(np.int64)
+    episodes = np.trunc(days * episodes_per_day[entry])
+    counts += np.bincount(slot(months), weights=episodes, minlength=size)
+    present[slot(months)] = True
+
+    index = pd.PeriodIndex(base + np.flatnonzero(present), freq="M")
+    return pd.Series(counts[present].astype(np.int64), index=index)
+
+
+def cour_labels(quarters: pd.PeriodIndex) -> list[str]:
+    """
+    Returns labels like `Winter 2024` for quarterly periods.
+    """
+    return [
+        f"{COUR_SEASONS[q - 1]} {y}" for q, y in zip(quarters.quarter, quarters.year)
+    ]
+
+
+def cour_rating_percentages(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the percentages of bad, average and good scores of the anime started in each cour,
+    indexed by quarterly periods in ascending order. Cours without scored anime are left out.
+    """
+    df = df[df["my_score"] > 0]
+    if len(df) == 0:
+        return pd.DataFrame(
+            columns=list(RATING_BANDS), index=pd.PeriodIndex([], freq="Q"), dtype=float
+        )
+
+    cours = df["my_start_date"].dt.to_period("Q")
+    bands = pd.cut(df["my_score"], RATING_BAND_EDGES, labels=RATING_BANDS)
+    percentages = pd.crosstab(cours, bands, normalize="index").reindex(
+        columns=list(RATING_BANDS), fill_value=0.0
+    )
+    # python's round, numpy rounds some halves differently
+    return (percentages * 100).map(lambda p: round(p, 2))
+
+
+class UserlistAggregator:
+    """
+    Computes the data of the charts and the summary from a prepared animelist, which
+    must have a `series_genre_mask` column for the charts drawn from genres. The columns
+    and masks shared by several charts are computed only once.
+    """
+
+    def __init__(self, df: pd.DataFrame, opts: VisualizationOptions) -> None:
+        self.df = df
+        self.opts = opts
+
+    @cached_property
+    def genre_matrix(self) -> np.ndarray:
+        return genre_matrix(self.df["series_genre_mask"].to_numpy())
+
+    def genre_columns(self, ignore_nsfw: bool, ignore_others: bool = True):
+        """
+        Returns the columns of the genre matrix to consider. NSFW genres are excluded
+        if `ignore_nsfw` is set and the ignored genres if `ignore_others` is set.
+        """
+        excluded = (
+            IVisualizationDriver.IGNORE_GENRES if ignore_others else tuple()
+        ) + (IVisualizationDriver.NSFW_GENRES if ignore_nsfw else tuple())
+        return genre_columns(excluded)
+
+    @cached_property
+    def started(self) -> np.ndarray:
+        return self.df["my_start_date"].notna().to_numpy()
+
+    @cached_property
+    def scored(self) -> np.ndarray:
+        return (self.df["my_score"] != 0).to_numpy()
+
+    def monthwise_count(self):
+        df = self.df[self.started]
+        if len(df) == 0:
+            return None
+
+        counts = monthwise_episode_counts(
+            df["my_start_date"].to_numpy(),
+            df["my_finish_date"].to_numpy(),
+            df["my_watched_episodes"].to_numpy(),
+            date.today(),
+        ).iloc[-12:]
+
+        # the daily average of every month
+        values = [
+            round(int(c) / int(d), 2)
+            for c, d in zip(counts, counts.index.days_in_month)
+        ]
+        return ChartSeries(list(counts.index.strftime("%b %Y")), {"episodes": values})
+
+    def courwise_ratings(self):
+        df = self.df[self.started]
+        if len(df) == 0:
+            return None
+
+        percentages = cour_rating_percentages(df)
+        return ChartSeries(
+            cour_labels(percentages.index),
+            {band: percentages[band].tolist() for band in RATING_BANDS},
+        )
+
+    def genre_distribution(self):
+        if len(self.df) == 0:
+            return None
+
+        # todo implement count upcoming option
+        columns = self.genre_columns(self.opts.disable_nsfw)
+        counts = self.genre_matrix.sum(axis=0)
+        # slices are in the order the genres first appear in the list, like they were
+        # counted before genres were bitmasks, genres of the same anime in GENRES order
+        first_seen = np.argmax(self.genre_matrix, axis=0)
+        genres = {
+            GENRES[i]: int(counts[i])
+            for i in np.argsort(first_seen, kind="stable")
+            if columns[i] and counts[i]
+        }
+        return ChartSeries(list(genres.keys()), {"count": list(genres.values())})
+
+    def genrewise_ratings(self):
+        rated = (self.df["my_status"] != "Plan to Watch").to_numpy() & self.scored
+        if not rated.any():
+            return None
+
+        # masked mean of the scores of each genre
+        matrix = self.genre_matrix[rated]
+        scores = self.df["my_score"].to_numpy(dtype=float)[rated]
+        counts = matrix.sum(axis=0)
+        sums = scores @ matrix
+        columns = self.genre_columns(self.opts.disable_nsfw, ignore_others=False)
+
+        average_data = {
+            g: round(float(total / count), 2)
+            for g, total, count, considered in zip(GENRES, sums, counts, columns)
+            if considered and count != 0
+        }
+        average_data = dict(sorted(average_data.items(), key=lambda x: x[1]))
+        return ChartSeries(list(average_data.keys()), {"average": list(average_data.values())})
+
+    def ratings_curve(self):
+        if not self.scored.any():
+            return None
+
+        counts = np.bincount(self.df["my_score"].to_numpy()[self.scored], minlength=11)
+        return ChartSeries(list(range(1, 11)), {"count": counts[1:11].tolist()})
+
+    def remaining_watching(self):
+        df = self.df[(self.df["my_status"] == "Watching").to_numpy()]
+        if len(df) == 0:
+            return None
+
+        watched = df["my_watched_episodes"]
+        total_episodes = df["series_episodes"]
+        max_total = total_episodes.max()
+        # anime whose episode count isn't known yet are drawn as long as the longest one
+        total_episodes_fixed = total_episodes.where(total_episodes > 0, max_total)
+        remaining = total_episodes_fixed - watched
+
+        watched_scaled = watched / total_episodes_fixed * max_total
+        remaining_scaled = remaining / total_episodes_fixed * max_total
+
+        unknown = total_episodes == 0
+        remaining[unknown] = 0
+        remaining_scaled[unknown] = 0
+
+        # entries with the same trimmed title are drawn once, with the values of the last one
+        rows = {
+            name: row
+            for name, *row in zip(
+                df["series_title"].map(trim_anime_title),
+                watched.tolist(),
+                watched_scaled.tolist(),
+                remaining.tolist(),
+                remaining_scaled.tolist(),
+            )
+        }
+        columns = ("watched", "watched_scaled", "remaining", "remaining_scaled")
+        return ChartSeries(
+            list(rows.keys()),
+            {c: [row[i] for row in rows.values()] for i, c in enumerate(columns)},
+        )
+
+    def format_distribution(self):
+        if len(self.df) == 0:
+            return None
+
+        # every anime counts once per genre it has, like the genre distribution
+        columns = self.genre_columns(self.opts.disable_nsfw)
+        weights = self.genre_matrix[:, columns].sum(axis=1)
+        series_type = self.df["series_type"]
+        considered = ~series_type.isin(IGNORED_FORMATS).to_numpy() & (weights > 0)
+        type_counts = (
+            pd.Series(weights[considered])
+            .groupby(series_type.to_numpy()[considered], sort=False)
+            .sum()
+        )
+        return ChartSeries(
+            [str(k) for k in type_counts.index], {"count": type_counts.tolist()}
+        )
+
+    def status_distribution(self):
+        if len(self.df) == 0:
+            return None
+
+        # value_counts of a categorical column includes the statuses not in the list
+        status_counts = self.df["my_status"].value_counts()
+        status_counts = status_counts[status_counts > 0]
+        return ChartSeries(
+            [str(s) for s in status_counts.index], {"count": status_counts.tolist()}
+        )
+
+    def fastest_finished(self):
+        # anime which are completed and whose start and finish dates exist
+        df = self.df[
+            (self.df["my_status"] == "Completed").to_numpy()
+            & self.started
+            & self.df["my_finish_date"].notna().to_numpy()
+            & (self.df["my_watched_episodes"] != 0).to_numpy()
+        ]
+        if len(df) == 0:
+            return None
+
+        # anime finished on the day they were started took a day
+        days = (df["my_finish_date"] - df["my_start_date"]).dt.days.clip(lower=1)
+        episode_day_ratio = df["my_watched_episodes"] / days
+
+        # stable, so ties keep the order of the list
+        fastest = episode_day_ratio.sort_values(ascending=False, kind="stable").iloc[:10]
+        return ChartSeries(
+            [trim_anime_title(t, 15) for t in df["series_title"][fastest.index]],
+            {"episodes_per_day": fastest.tolist()},
+        )
+
+    def summary(self):
+        """
+        Calculates Key Performance Indicators (KPIs) for the user's animelist.
+        """
+        total_anime = int(len(self.df))
+        completed = int((self.df["my_status"] == "Completed").sum())
+        total_episodes = int(self.df["my_watched_episodes"].sum())
+
+        # Mean score (excluding unrated)
+        scores = self.df["my_score"].to_numpy()[self.scored]
+        mean_score = float(scores.mean()) if len(scores) else 0.0
+
+        # Approximate watch time (assume 24 mins per episode)
+        total_minutes = total_episodes * 24
+        days = total_minutes // (24 * 60)
+
+        # Recent activity (this month)
+        today = date.today()
+        finish_dates = self.df["my_finish_date"].dt
+        count_this_month = int(
+            ((finish_dates.year == today.year) & (finish_dates.month == today.month)).sum()
+        )
+
+        # Favorite genre factor, unknown if no chart needed the genres
+        most_common_genre = "N/A"
+        if "series_genre_mask" in self.df.columns:
+            genre_counts = self.genre_matrix.sum(axis=0)
+            if genre_counts.any():
+                most_common_genre = GENRES[int(np.argmax(genre_counts))]
+
+        return {
+            "total_anime": total_anime,
+            "completed": completed,
+            "total_episodes": total_episodes,
+            "mean_score": round(float(mean_score), 2),
+            "days_watched": int(days),
+            "finished_this_month": count_this_month,
+            "favorite_genre": most_common_genre,
+        }
+
+    def _chart(self, name: str) -> ChartSeries | None:
+        # a chart which can't be computed shouldn't take the others down with it
+        try:
+            return getattr(self, name)()
+        except Exception as e:
+            logging.error(f"error occured while aggregating {name}")
+            logging.exception(e)
+            return None
+
+    def aggregate(self, charts: Iterable[str] = CHARTS) -> Aggregates:
+        """
+        Computes the data of the given charts and the summary, the others are `None`.
+        """
+        charts = set(charts)
+        return Aggregates(
+            **{name: self._chart(name) if name in charts else None for name in CHARTS},
+            summary=self.summary(),
+        )
@@ -1,55 +1,62 @@
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import cache
 from pathlib import Path
 from urllib.parse import urlencode
 
-import requests
+import niquests
 from dotenv import load_dotenv
-from mysql.connector.errors import IntegrityError
-from pandas import DataFrame
+from pandas import DataFrame, Series
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from database import db_session
-from models import Anime, AnimeGenre, Genre
-
-KNOWN_GENRES = set(
-    (
-        "Action",
-        "Adventure",
-        "Comedy",
-        "Drama",
-        "Fantasy",
-        "Gourmet",
-        "Horror",
-        "Isekai",
-        "Mystery",
-        "Romance",
-        "Sci-Fi",
-        "Slice of Life",
-        "Sports",
-        "Suspense",
-        "Erotica",
-        "Ecchi",
-        "Hentai",
-    )
-)
+from mal_client import mal_client
+from models import Anime, AnimeGenre, AnimeLookupMiss, Genre
+from recommendations.anime_store import AnimeStore
+
+from .cache import genre_cache
+from .genre_writer import genre_writer
+from .genres import KNOWN_GENRES
 
 load_dotenv("../credentials.env")
 
+# keeps the IN (...) lists well below mysql's max_allowed_packet for huge lists
+BULK_QUERY_CHUNK_SIZE = 1000
+
+# MAL splits the genres animeviz tracks between its genres, explicit genres (ecchi,
+# erotica, hentai) and themes (isekai), the local dataset must have all three
+LOCAL_GENRE_COLUMNS = ("genres", "explicit_genres", "themes")
+
+# misses are also kept in the genre cache, for a shorter while
+LOOKUP_MISS_CACHE_TTL = int(os.getenv("LOOKUP_MISS_CACHE_TTL", str(24 * 60 * 60)))
+
+
+class AnimeNotFoundError(Exception):
+    """
+    Raised when the MAL API doesn't know about an anime.
+    """
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 def _anime_genres_mal(anime_id: str) -> tuple[Anime | None, list[Genre]]:
     """
     Sends a request to the MAL API to fetch the genres of the given anime.
+    Raises `AnimeNotFoundError` if MAL responds with a 404.
     """
     try:
         anime_endpoint = f"https://api.myanimelist.net/v2/anime/{anime_id}?"
         query = urlencode({"fields": "genres"})
         api_url = anime_endpoint + query
-        resp = requests.get(
+        resp = mal_client.get(
             api_url,
+            deadline=20,
             headers={"X-MAL-CLIENT-ID": os.environ["MAL_CLIENT_ID"]},
-            timeout=20,
         )
         resp.raise_for_status()
         anime_data = resp.json()
@@ -58,7 +65,9 @@ def _anime_genres_mal(anime_id: str) -> tuple[Anime | None, list[Genre]]:
             Genre(**g) for g in anime_data["genres"] if g["name"] in KNOWN_GENRES
         ]
 
-    except requests.HTTPError:
+    except niquests.HTTPError:
+        if resp.status_code == 404:
+            raise AnimeNotFoundError(anime_id) from None
         logging.error(
             f"non 200 status code returned from MAL API, {api_url=}, {resp.status_code=}"
         )
@@ -75,47 +84,185 @@ def _anime_genres_mal(anime_id: str) -> tuple[Anime | None, list[Genre]]:
         return None, []
 
 
-def add_anime_genres_to_db(new_anime: Anime, genres: list[Genre]):
-    db_session.add(new_anime)
-    for genre in genres:
-        try:
-            if db_session.query(Genre).filter_by(id=genre.id).first():
-                continue
-            db_session.add(genre)
-        except IntegrityError as e:
-            logging.error(f"adding entry {genre} to database raises IntegrityError")
-            logging.exception(e)
+def record_lookup_misses(misses: dict[int, str]):
+    """
+    Remembers the anime which couldn't be resolved along with the reason, so that lookups
+    skip them until the miss expires. The misses are written to the database in the background.
+    """
+    if not misses:
+        return
+
+    genre_cache.set_many({i: [] for i in misses}, ttl=LOOKUP_MISS_CACHE_TTL)
+    genre_writer.put_lookup_misses(misses)
 
-    db_session.commit()
 
-    anime_genres_objs = [AnimeGenre(new_anime.id, genre.id) for genre in genres]
-    db_session.add_all(anime_genres_objs)
+def _lookup_misses(anime_ids: list[int]) -> set[int]:
+    """
+    Returns the anime among the given ones which are marked as unresolvable and not yet expired.
+    """
+    misses: set[int] = set()
+    now = _utcnow()
+    for i in range(0, len(anime_ids), BULK_QUERY_CHUNK_SIZE):
+        chunk = anime_ids[i : i + BULK_QUERY_CHUNK_SIZE]
+        rows = db_session.query(AnimeLookupMiss.anime_id).filter(
+            AnimeLookupMiss.anime_id.in_(chunk), AnimeLookupMiss.expires_at > now
+        )
+        misses.update(anime_id for (anime_id,) in rows)
+
+    if misses:
+        genre_cache.set_many({i: [] for i in misses}, ttl=LOOKUP_MISS_CACHE_TTL)
+    return misses
 
-    db_session.commit()
+
+@cache
+def _local_anime_store() -> AnimeStore | None:
+    """
+    Opens the `AnimeStore` dataset once per worker, `None` if it can't be opened or
+    lacks some of the genre columns, its genres would then be incomplete.
+    """
+    try:
+        store = AnimeStore()
+    except Exception as e:
+        logging.error("unable to load the anime dataset, genres wont be resolved locally")
+        logging.exception(e)
+        return None
+
+    missing = [c for c in LOCAL_GENRE_COLUMNS if c not in store.column_kinds]
+    if missing:
+        logging.warning(
+            f"the anime dataset has no {', '.join(missing)} column, "
+            "genres wont be resolved locally"
+        )
+        return None
+    return store
+
+
+def _anime_genres_local(anime_ids: list[int]) -> dict[int, list[str]]:
+    """
+    Returns the genres of the given anime present in the local dataset.
+    """
+    store = _local_anime_store()
+    if store is None:
+        return {}
+
+    rows = store.get_many(anime_ids, ["id", *LOCAL_GENRE_COLUMNS])
+    return {
+        int(anime_id): [
+            g
+            for names in row_names
+            for g in (g.strip() for g in names.split("|"))
+            if g in KNOWN_GENRES
+        ]
+        for anime_id, *row_names in zip(
+            rows["id"].tolist(), *(rows[c] for c in LOCAL_GENRE_COLUMNS)
+        )
+    }
 
 
 def get_anime_genres(anime_id: str):
     """
-    Returns the genres of anime if present in the database, otherwise sends request to MAL API.
+    Returns the genres of anime if present in the local dataset, the cache or the database,
+    otherwise sends request to MAL API.
+    """
+    return get_anime_genres_bulk(Series([int(anime_id)]), 1)[0]
+
+
+def _anime_genres_from_db(anime_ids: list[int]) -> dict[int, list[str]]:
+    """
+    Fetches the genres of all the given anime from the database using set based queries.
+    Anime which are present in the database but have no genres are mapped to an empty list,
+    anime absent from the database are not present in the returned dictionary.
+    """
+    genres: dict[int, list[str]] = {}
+    for i in range(0, len(anime_ids), BULK_QUERY_CHUNK_SIZE):
+        chunk = anime_ids[i : i + BULK_QUERY_CHUNK_SIZE]
+        known_ids = db_session.query(Anime.id).filter(Anime.id.in_(chunk))
+        chunk_genres: dict[int, list[str]] = {id_: [] for (id_,) in known_ids}
+
+        rows = (
+            db_session.query(AnimeGenre.anime_id, Genre.name)
+            .join(Genre, Genre.id == AnimeGenre.genre_id)
+            .filter(AnimeGenre.anime_id.in_(chunk))
+        )
+        for anime_id, genre_name in rows:
+            chunk_genres.setdefault(anime_id, []).append(genre_name)
+
+        genres.update(chunk_genres)
+
+    return genres
+
+
+def _anime_genres_from_mal(anime_id: int) -> tuple[list[str] | None, str | None]:
+    """
+    Fetches the genres of an anime absent from the database from the MAL API and queues them
+    to be stored. Returns the genres, or `None` along with the reason of the miss if they couldn't be resolved.
+    The reason is `None` for transient failures, which shouldn't be remembered.
     """
     try:
-        anime = Anime.query.filter_by(id=anime_id).first()
-        logging.debug("anime object found in database:", anime)
-        if not anime:
-            anime_obj, genres = _anime_genres_mal(anime_id)
-            if not anime_obj or not genres:
-                return []
-            add_anime_genres_to_db(anime_obj, genres)
-            genres = [g.name for g in genres]
-        else:
-            genres = [g.name for g in anime.genres]
-
-        return genres
+        anime_obj, genres = _anime_genres_mal(str(anime_id))
+        if not anime_obj:
+            return None, None
+        if not genres:
+            return None, AnimeLookupMiss.NO_GENRES
+        genre_writer.put_anime(anime_obj, genres)
+        return [g.name for g in genres], None
+
+    except AnimeNotFoundError:
+        return None, AnimeLookupMiss.NOT_FOUND
 
     except Exception as e:
         logging.error("error occured while fetching genres for {}".format(anime_id))
         logging.exception(e)
-        return []
+        return None, None
+
+
+def get_anime_genres_bulk(anime_ids: Series, max_workers: int) -> list[list[str]]:
+    """
+    Returns the genres of every anime in `anime_ids`, aligned with it.
+    Genres are looked up in the local dataset and the genre cache first, all the anime
+    present in the database are then fetched at once, and only the missing ones are
+    requested from the MAL API, using at most `max_workers` threads.
+    """
+    unique_ids = [int(i) for i in anime_ids.drop_duplicates()]
+    genres = _anime_genres_local(unique_ids)
+
+    not_local_ids = [i for i in unique_ids if i not in genres]
+    if not_local_ids:
+        genres.update(genre_cache.get_many(not_local_ids))
+
+    uncached_ids = [i for i in not_local_ids if i not in genres]
+    resolved: dict[int, list[str]] = {}
+    missing_ids: list[int] = []
+    if uncached_ids:
+        try:
+            resolved = _anime_genres_from_db(uncached_ids)
+            missing_ids = [i for i in uncached_ids if i not in resolved]
+            # anime known to be unresolvable are skipped
+            misses = _lookup_misses(missing_ids) if missing_ids else set()
+            missing_ids = [i for i in missing_ids if i not in misses]
+        except Exception as e:
+            logging.error("error occured while fetching genres in bulk from the database")
+            logging.exception(e)
+            missing_ids = [i for i in uncached_ids if i not in resolved]
+
+    new_misses: dict[int, str] = {}
+    if missing_ids:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(missing_ids), max_workers))
+        ) as pool:
+            for anime_id, (mal_genres, miss_reason) in zip(
+                missing_ids, pool.map(_anime_genres_from_mal, missing_ids)
+            ):
+                if mal_genres is not None:
+                    resolved[anime_id] = mal_genres
+                elif miss_reason is not None:
+                    new_misses[anime_id] = miss_reason
+
+    record_lookup_misses(new_misses)
+    genre_cache.set_many(resolved)
+    genres.update(resolved)
+
+    return [list(genres.get(int(i), [])) for i in anime_ids]
 
 
 def build_df_from_mal_api_data(data: list):
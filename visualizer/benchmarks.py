@@ -0,0 +1,248 @@
+"""
+Benchmarks of the visualizer on synthetic animelists, run with `python -m visualizer.benchmarks`.
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+from timeit import repeat
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from userlist import LIST_STATUSES, prepare_userlist_df
+
+from .aggregates import UserlistAggregator, monthwise_episode_counts
+from .drivers.base import ChartSeries, PlotlyVisualizationResult, VisualizationOptions
+from .drivers.courwise_ratings import CourwiseRatingsDriver
+from .drivers.fastest_finished import FastestFinishedDriver
+from .drivers.format_distribution import FormatDistributionDriver
+from .drivers.genre_distribution import GenreDistributionDriver
+from .drivers.genre_ratings import GenrewiseRatingsDriver
+from .drivers.monthwise_count import MonthwiseCountDriver
+from .drivers.ratings_curve import RatingsCurveDriver
+from .drivers.remaining_watching import RemainingCountDriver
+from .drivers.status_distribution import StatusDistributionDriver
+from .genres import GENRES, encode_genres
+
+LIST_SIZES = (1_000, 2_500, 5_000, 10_000)
+
+
+def synthetic_userlist(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Returns a prepared animelist of `n` random entries started in the last ten years,
+    with up to three random genres each.
+    """
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(date.today(), "D")
+    start = today - rng.integers(0, 3650, n)
+    finish = np.minimum(start + rng.integers(0, 365, n), today)
+    status = rng.choice(LIST_STATUSES, n)
+    episodes = rng.integers(1, 64, n)
+
+    df = pd.DataFrame(
+        {
+            "series_animedb_id": np.arange(1, n + 1),
+            "series_title": [f"Anime {i}" for i in range(n)],
+            "series_type": rng.choice(["TV", "Movie", "OVA", "ONA", "Special"], n),
+            "series_episodes": episodes,
+            "my_watched_episodes": rng.integers(0, episodes + 1),
+            "my_start_date": start,
+            # only completed anime have a finish date
+            "my_finish_date": np.where(status == "Completed", finish, np.datetime64("NaT")),
+            "my_score": rng.integers(0, 11, n),
+            "my_status": status,
+        }
+    )
+    df = prepare_userlist_df(df)
+    df["series_genre_mask"] = encode_genres(
+        rng.choice(GENRES, rng.integers(0, 4), replace=False) for _ in range(n)
+    )
+    return df
+
+
+def bench(fn, number: int = 20) -> float:
+    """
+    Returns the best time of a single call of `fn`, in seconds.
+    """
+    return min(repeat(fn, number=number, repeat=5)) / number
+
+
+def bench_monthwise_count():
+    print("monthwise episode counts")
+    today = date.today()
+    for n in LIST_SIZES:
+        df = synthetic_userlist(n)
+        df = df[df["my_start_date"].notna()]
+        args = (
+            df["my_start_date"].to_numpy(),
+            df["my_finish_date"].to_numpy(),
+            df["my_watched_episodes"].to_numpy(),
+            today,
+        )
+        t = bench(lambda: monthwise_episode_counts(*args))
+        print(f"{n:>8} rows {t * 1e3:>9.3f} ms {t / n * 1e6:>8.3f} µs/row")
+
+
+def bench_aggregate():
+    print("all chart data and the summary")
+    opts = VisualizationOptions(
+        disable_nsfw=True, count_upcoming=False, interactive_charts=True
+    )
+    for n in LIST_SIZES:
+        df = synthetic_userlist(n)
+        t = bench(lambda: UserlistAggregator(df, opts).aggregate(), number=5)
+        print(f"{n:>8} rows {t * 1e3:>9.3f} ms {t / n * 1e6:>8.3f} µs/row")
+
+
+# the plotly.express figures the drivers used to draw, to compare the figure specs with
+def _px_monthwise_count(data: ChartSeries):
+    fig = px.bar(
+        x=data.labels,
+        y=data.series["episodes"],
+        labels={"x": "Months", "y": "Number of episodes watched (on daily average)"},
+    )
+    fig.update_traces(marker_color="skyblue", opacity=0.7)
+    fig.add_trace(
+        px.line(x=data.labels, y=data.series["episodes"], line_shape="linear").data[0]
+    )
+    return fig.update_xaxes(tickangle=45)
+
+
+def _px_courwise_ratings(data: ChartSeries):
+    return px.bar(
+        pd.DataFrame({"cours": data.labels, **data.series}),
+        x="cours",
+        y=["bad", "average", "good"],
+        title="Ratings Distribution of Anime Each Season",
+        color_discrete_sequence=["#e03c32", "#ffd301", "#7bb662"],
+    )
+
+
+def _px_pie(names: str, title: str, hole: float, labels_inside: bool = False):
+    def figure(data: ChartSeries):
+        df = pd.DataFrame({names: data.labels, "Count": data.series["count"]})
+        df["Percentage"] = (df["Count"] / df["Count"].sum() * 100).round(2)
+        fig = px.pie(
+            df,
+            values="Count",
+            names=names,
+            title=title,
+            hole=hole,
+            hover_data=["Percentage"],
+        )
+        if labels_inside:
+            fig.update_traces(textposition="inside", textinfo="percent+label")
+        return fig
+
+    return figure
+
+
+def _px_genrewise_ratings(data: ChartSeries):
+    return px.bar(
+        pd.DataFrame({"Genres": data.labels, "Average Rating": data.series["average"]}),
+        x="Genres",
+        y="Average Rating",
+        title="Average rating of anime per genre",
+    )
+
+
+def _px_ratings_curve(data: ChartSeries):
+    given = {k: v for k, v in zip(data.labels, data.series["count"]) if v}
+    fig = px.bar(
+        x=list(given.keys()),
+        y=list(given.values()),
+        labels={"x": "Rating Value (1-10)", "y": "Rating Count"},
+    )
+    fig.update_xaxes(type="category", tickmode="array", tickvals=list(range(1, 11)))
+    fig.update_traces(marker_color="skyblue", opacity=0.7)
+    return fig.update_layout(title="Ratings Distribution")
+
+
+def _px_remaining_watching(data: ChartSeries):
+    return px.bar(
+        pd.DataFrame({"names": data.labels, **data.series}),
+        x=["watched_scaled", "remaining_scaled"],
+        y="names",
+        orientation="h",
+        title="Watched vs Remaining Episodes",
+        color_discrete_sequence=px.colors.qualitative.Set3,
+    )
+
+
+def _px_status_distribution(data: ChartSeries):
+    fig = px.pie(
+        pd.DataFrame({"Status": data.labels, "Count": data.series["count"]}),
+        values="Count",
+        names="Status",
+        hole=0.4,
+        title="List Status Breakdown",
+        color_discrete_sequence=px.colors.qualitative.Pastel,
+    )
+    return fig.update_traces(textposition="inside", textinfo="percent+label")
+
+
+def _px_fastest_finished(data: ChartSeries):
+    return px.bar(
+        pd.DataFrame(
+            {
+                "Anime Names": data.labels,
+                "Episodes watched per day": data.series["episodes_per_day"],
+            }
+        ),
+        x="Anime Names",
+        y="Episodes watched per day",
+        title="Fastest Finished Anime (by episodes watched per day)",
+        color_discrete_sequence=["#FF9999"],
+    )
+
+
+# a driver and the plotly.express figure of its chart
+PX_FIGURES = (
+    (MonthwiseCountDriver, _px_monthwise_count),
+    (CourwiseRatingsDriver, _px_courwise_ratings),
+    (GenreDistributionDriver, _px_pie("Genre", "Anime Genre Distribution", 0.1)),
+    (GenrewiseRatingsDriver, _px_genrewise_ratings),
+    (RatingsCurveDriver, _px_ratings_curve),
+    (RemainingCountDriver, _px_remaining_watching),
+    (
+        FormatDistributionDriver,
+        _px_pie("Format", "Format Distribution", 0.1, labels_inside=True),
+    ),
+    (StatusDistributionDriver, _px_status_distribution),
+    (FastestFinishedDriver, _px_fastest_finished),
+)
+
+
+def bench_plotly_figures():
+    print("interactive charts, plotly.express vs figure specs, serialized")
+    opts = VisualizationOptions(
+        disable_nsfw=True,
+        count_upcoming=False,
+        interactive_charts=True,
+        compact_figures=True,
+    )
+    df = synthetic_userlist(LIST_SIZES[-1])
+    aggregates = UserlistAggregator(df, opts).aggregate()
+    for driver_cls, px_figure in PX_FIGURES:
+        name = driver_cls.name
+        data = getattr(aggregates, name)
+        driver = driver_cls(data, opts)
+        px_time = bench(
+            lambda: PlotlyVisualizationResult(
+                driver.title, px_figure(data), compact=True
+            ).as_dict()
+        )
+        spec_time = bench(lambda: driver.visualize().as_dict())
+        print(
+            f"{name:>20} px {px_time * 1e3:>8.3f} ms spec {spec_time * 1e3:>8.3f} ms"
+            f" {px_time / spec_time:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    bench_monthwise_count()
+    bench_aggregate()
+    bench_plotly_figures()
@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Iterable
+
+import redis
+from dotenv import load_dotenv
+
+load_dotenv("./credentials.env")
+
+GENRE_CACHE_SIZE = int(os.getenv("GENRE_CACHE_SIZE", "50000"))
+GENRE_CACHE_TTL = int(os.getenv("GENRE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+# the genre cache shares the redis instance used by flask-limiter unless told otherwise
+CACHE_REDIS_URI = os.getenv(
+    "CACHE_REDIS_URI", os.getenv("FLASK_LIMITER_STORAGE_URI", "")
+)
+
+_MISSING = object()
+
+
+def get_redis_client(uri: str = CACHE_REDIS_URI) -> redis.Redis | None:
+    """
+    Returns a redis client for the given URI, or `None` if the URI doesn't point to redis.
+    The client connects lazily, on the first command.
+    """
+    if not uri.startswith(("redis://", "rediss://", "unix://")):
+        return None
+    return redis.Redis.from_url(uri, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+class TTLCache:
+    """
+    A thread safe, bounded LRU cache whose entries expire `ttl` seconds after being set.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class GenreCache:
+    """
+    Two level cache of anime genres.
+    L1 is an in-process `TTLCache`, L2 is redis, shared by every worker.
+    """
+
+    KEY_PREFIX = "animeviz:genres:"
+
+    def __init__(
+        self, l1: TTLCache, l2: redis.Redis | None, ttl: int = GENRE_CACHE_TTL
+    ) -> None:
+        self.l1 = l1
+        self.l2 = l2
+        self.ttl = ttl
+        self._lock = Lock()
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(TTLCache(GENRE_CACHE_SIZE, GENRE_CACHE_TTL), get_redis_client())
+
+    def _key(self, anime_id: int):
+        return f"{self.KEY_PREFIX}{anime_id}"
+
+    def get_many(self, anime_ids: Iterable[int]) -> dict[int, list[str]]:
+        """
+        Returns the cached genres of the given anime. Anime absent from both levels
+        are not present in the returned dictionary.
+        """
+        found: dict[int, list[str]] = {}
+        l1_missing: list[int] = []
+        for anime_id in anime_ids:
+            genres = self.l1.get(anime_id, _MISSING)
+            if genres is _MISSING:
+                l1_missing.append(anime_id)
+            else:
+                found[anime_id] = genres
+
+        if not l1_missing or self.l2 is None:
+            return found
+
+        try:
+            # fetch the remaining TTLs too, so that L1 entries don't outlive L2 ones
+            pipe = self.l2.pipeline(transaction=False)
+            for anime_id in l1_missing:
+                pipe.get(self._key(anime_id))
+                pipe.ttl(self._key(anime_id))
+            replies = pipe.execute()
+        except redis.RedisError as e:
+            logging.warning(f"unable to read genres from redis: {e}")
+            with self._lock:
+                self.l2_errors += 1
+            return found
+
+        hits = 0
+        for anime_id, value, ttl in zip(l1_missing, replies[::2], replies[1::2]):
+            if value is None:
+                continue
+            genres = json.loads(value)
+            self.l1.set(anime_id, genres, ttl if ttl > 0 else None)
+            found[anime_id] = genres
+            hits += 1
+
+        with self._lock:
+            self.l2_hits += hits
+            self.l2_misses += len(l1_missing) - hits
+
+        return found
+
+    def set_many(self, genres: dict[int, list[str]], ttl: int | None = None):
+        """
+        Caches the given genres in both levels, for `ttl` seconds if passed, otherwise
+        for the default TTL of the cache.
+        """
+        if not genres:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        for anime_id, genre_names in genres.items():
+            self.l1.set(anime_id, genre_names, ttl)
+
+        if self.l2 is None:
+            return
+
+        try:
+            pipe = self.l2.pipeline(transaction=False)
+            for anime_id, genre_names in genres.items():
+                pipe.set(self._key(anime_id), json.dumps(genre_names), ex=ttl)
+            pipe.execute()
+        except redis.RedisError as e:
+            logging.warning(f"unable to write genres to redis: {e}")
+            with self._lock:
+                self.l2_errors += 1
+
+    def stats(self):
+        with self._lock:
+            l2_lookups = self.l2_hits + self.l2_misses
+            l2_stats = {
+                "enabled": self.l2 is not None,
+                "hits": self.l2_hits,
+                "misses": self.l2_misses,
+                "hit_rate": round(self.l2_hits / l2_lookups, 4) if l2_lookups else 0.0,
+                "errors": self.l2_errors,
+            }
+        return {"l1": self.l1.stats(), "l2": l2_stats}
+
+
+genre_cache = GenreCache.from_env()
@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import os
+import re
+
+import redis
+from dotenv import load_dotenv
+
+from .cache import get_redis_client
+from .figures import IMAGE_MIMETYPES
+from .result_cache import DiskResultStore, RedisResultStore
+
+load_dotenv("./credentials.env")
+
+# total size of the stored chart images, 0 disables the store
+CHART_STORE_MAX_BYTES = int(os.getenv("CHART_STORE_MAX_BYTES", str(128 * 1024 * 1024)))
+# chart images are only meant to be fetched right after being drawn
+CHART_STORE_MAX_AGE = int(os.getenv("CHART_STORE_MAX_AGE", str(60 * 60)))
+# chart images are stored here when there's no redis to store them in
+CHART_STORE_DIR = os.getenv("CHART_STORE_DIR", "./.chart_store")
+
+_CHART_KEY_RE = re.compile(rf"^[0-9a-f]{{32}}\.({'|'.join(IMAGE_MIMETYPES)})$")
+
+
+class RedisChartStore(RedisResultStore):
+    """
+    Stores chart images in redis, under keys of their own.
+    """
+
+    KEY_PREFIX = "animeviz:charts:"
+    LRU_KEY = "animeviz:charts-lru"
+    SIZES_KEY = "animeviz:charts-sizes"
+    TOTAL_KEY = "animeviz:charts-total"
+
+
+class ChartStore:
+    """
+    Short lived store of rendered chart images, served at `/charts/<key>`.
+    Images are addressed by the hash of their content, so the same chart is stored once
+    and its URL can be cached by browsers for as long as it lives.
+    """
+
+    def __init__(self, store: RedisChartStore | DiskResultStore | None) -> None:
+        self.store = store
+
+    @classmethod
+    def from_env(cls):
+        if CHART_STORE_MAX_BYTES <= 0:
+            return cls(None)
+        client = get_redis_client()
+        if client is not None:
+            return cls(
+                RedisChartStore(client, CHART_STORE_MAX_BYTES, CHART_STORE_MAX_AGE)
+            )
+        return cls(
+            DiskResultStore(CHART_STORE_DIR, CHART_STORE_MAX_BYTES, CHART_STORE_MAX_AGE)
+        )
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    @staticmethod
+    def is_key(key: str) -> bool:
+        return _CHART_KEY_RE.match(key) is not None
+
+    @staticmethod
+    def url(key: str) -> str:
+        return f"/charts/{key}"
+
+    def put(self, image: bytes, format: str) -> str | None:
+        """
+        Stores the image, returns its key or `None` if it couldn't be stored.
+        """
+        if self.store is None:
+            return None
+        key = f"{hashlib.blake2b(image, digest_size=16).hexdigest()}.{format}"
+        try:
+            self.store.set(key, image)
+        except (redis.RedisError, OSError) as e:
+            logging.warning(f"unable to store chart image: {e}")
+            return None
+        return key
+
+    def get(self, key: str) -> bytes | None:
+        if self.store is None or not self.is_key(key):
+            return None
+        try:
+            return self.store.get(key)
+        except (redis.RedisError, OSError, ValueError) as e:
+            logging.warning(f"unable to read chart image: {e}")
+            return None
+
+
+chart_store = ChartStore.from_env()
@@ -1,15 +1,26 @@
 import base64
+import json
 from abc import ABC, abstractmethod
 from dataclasses import asdict, dataclass
+from functools import cache
+from importlib.util import find_spec
 from io import BytesIO
 from pathlib import Path
 
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.io as pio
-from matplotlib import use as plt_use
 from matplotlib.figure import Figure as PltFigure
 
+from ..figures import CHART_IMAGE_DPI, CHART_IMAGE_FORMAT
+
+# orjson is optional, plotly serializes figures much faster with it
+FIGURE_JSON_ENGINE = "orjson" if find_spec("orjson") else "json"
+# floats in compact figures are rounded to this many digits
+FIGURE_FLOAT_DIGITS = 4
+# buttons added to the modebar of every plotly chart
+MODEBAR_BUTTONS = ["v1hovermode", "toggleSpikeLines"]
+
 
 @dataclass(frozen=True)
 class VisualizationOptions:
@@ -20,40 +31,268 @@ class VisualizationOptions:
     disable_nsfw: bool
     count_upcoming: bool
     interactive_charts: bool
+    # only return the data of the charts, the client draws them
+    data_only: bool = False
+    # serve matplotlib charts from the chart store instead of inlining them
+    image_urls: bool = False
+    # leave the plotly template out of the figures, it is sent once per response
+    compact_figures: bool = False
+
+
+@dataclass(frozen=True)
+class ChartSeries:
+    """
+    The data a chart is drawn from. Every series in `series` is aligned with `labels`.
+    """
+
+    labels: list
+    series: dict[str, list]
+
+    def as_dict(self):
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    """
+    Describes how a chart is drawn from its `ChartSeries`, for clients which draw it themselves.
+    `kind` is one of `bar`, `hbar`, `bar_line` and `pie`. Several series are stacked,
+    `series` limits the drawn series to the given ones.
+    """
+
+    kind: str
+    x_title: str = ""
+    y_title: str = ""
+    series: tuple[str, ...] | None = None
+    colors: tuple[str, ...] = ()
+    hole: float = 0.0
+
+
+@dataclass(frozen=True)
+class DataVisualizationResult:
+    """
+    Represents a visualization result containing only the data of a chart, along with
+    the `ChartSpec` to draw it with.
+    """
+
+    title: str
+    chart: ChartSpec
+    data: ChartSeries
+
+    def as_dict(self):
+        drawn = self.chart.series or tuple(self.data.series.keys())
+        return {
+            "title": self.title,
+            "chart": asdict(self.chart),
+            "labels": self.data.labels,
+            "series": {name: self.data.series[name] for name in drawn},
+        }
 
 
 @dataclass(frozen=True)
 class MatplotlibVisualizationResult:
     """
     Represents a visualization result of a chart rendered by matplotlib.
-    The image is of type `str` and must be a base64 string.
+    The image is of type `str` and must be a base64 string, it is empty if the image
+    is served at `url` instead.
     """
 
     title: str
     image: str
+    format: str = "png"
+    url: str | None = None
 
     def as_dict(self):
         return asdict(self)
 
 
+@dataclass(frozen=True)
+class ImageVisualizationResult:
+    """
+    Represents a chart rendered by matplotlib which is yet to be put in the chart store,
+    the image is of type `bytes`.
+    """
+
+    title: str
+    image: bytes
+    format: str
+
+
+@cache
+def plotly_template() -> dict:
+    """
+    Returns the default plotly template, which `plotly.express` applies to every figure.
+    Compact figures leave it out and refer to it by name instead.
+    """
+    template = pio.templates[pio.templates.default].to_plotly_json()
+    return json.loads(pio.json.to_json_plotly(template))
+
+
+def _round_floats(obj, digits: int):
+    if isinstance(obj, dict):
+        return {k: _round_floats(v, digits) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_round_floats(v, digits) for v in obj]
+    if isinstance(obj, np.ndarray) and np.issubdtype(obj.dtype, np.floating):
+        return obj.round(digits)
+    if isinstance(obj, float):
+        return round(obj, digits)
+    return obj
+
+
+# Figure specs are plain plotly figure dicts, `{"data": [...], "layout": {...}}`, built
+# straight from the chart data. The builders below emit the same traces and layouts
+# as `plotly.express` does, without its dataframes and property validation.
+
+
+def hover_template(*fields: tuple[str, str]) -> str:
+    """
+    Returns a hover template showing the given `(label, value)` pairs, e.g.
+    `("Months", "%{x}")` shows `Months=<x value>`.
+    """
+    shown = "<br>".join(f"{label}={value}" for label, value in fields)
+    return f"{shown}<extra></extra>"
+
+
+def bar_trace(
+    x,
+    y,
+    hovertemplate: str,
+    color: str,
+    name: str = "",
+    orientation: str = "v",
+    **props,
+) -> dict:
+    """
+    Returns a bar trace. Named traces are shown in the legend, and stacked with
+    the other bar traces of the figure.
+    """
+    return {
+        "alignmentgroup": "True",
+        "hovertemplate": hovertemplate,
+        "legendgroup": name,
+        "marker": {"color": color, "pattern": {"shape": ""}},
+        "name": name,
+        "offsetgroup": name,
+        "orientation": orientation,
+        "showlegend": bool(name),
+        "textposition": "auto",
+        "x": x,
+        "xaxis": "x",
+        "y": y,
+        "yaxis": "y",
+        "type": "bar",
+        **props,
+    }
+
+
+def line_trace(x, y, hovertemplate: str, color: str, **props) -> dict:
+    return {
+        "hovertemplate": hovertemplate,
+        "legendgroup": "",
+        "line": {"color": color, "dash": "solid", "shape": "linear"},
+        "marker": {"symbol": "circle"},
+        "mode": "lines",
+        "name": "",
+        "orientation": "v",
+        "showlegend": False,
+        "x": x,
+        "xaxis": "x",
+        "y": y,
+        "yaxis": "y",
+        "type": "scatter",
+        **props,
+    }
+
+
+def pie_trace(labels, values, hovertemplate: str, hole: float, **props) -> dict:
+    return {
+        "domain": {"x": [0.0, 1.0], "y": [0.0, 1.0]},
+        "hole": hole,
+        "hovertemplate": hovertemplate,
+        "labels": labels,
+        "legendgroup": "",
+        "name": "",
+        "showlegend": True,
+        "values": values,
+        "type": "pie",
+        **props,
+    }
+
+
+def xy_layout(
+    x_title: str,
+    y_title: str,
+    title: str | None = None,
+    legend_title: str = "",
+    **props,
+) -> dict:
+    """
+    Returns the layout of a figure with x and y axes, whose bar traces are stacked.
+    """
+    layout = {
+        "xaxis": {"anchor": "y", "domain": [0.0, 1.0], "title": {"text": x_title}},
+        "yaxis": {"anchor": "x", "domain": [0.0, 1.0], "title": {"text": y_title}},
+        "legend": {"tracegroupgap": 0},
+        "barmode": "relative",
+    }
+    if legend_title:
+        layout["legend"]["title"] = {"text": legend_title}
+    if title is None:
+        # leaves room for the modebar
+        layout["margin"] = {"t": 60}
+    else:
+        layout["title"] = {"text": title}
+    return {**layout, **props}
+
+
+def pie_layout(title: str, **props) -> dict:
+    return {"legend": {"tracegroupgap": 0}, "title": {"text": title}, **props}
+
+
 @dataclass(frozen=True)
 class PlotlyVisualizationResult:
     """
     Represents a visualization result of a chart rendered by plotly.
-    The figure is of type `plotly.graph_objects.Figure`.
+    The figure is either a `plotly.graph_objects.Figure` or a figure spec dict without
+    a template. Compact results leave the template out of the figure and round its
+    floats.
     """
 
     title: str
-    figure: go.Figure
+    figure: go.Figure | dict
+    compact: bool = False
 
     def as_dict(self):
         """
         Converts this dataclass to a dictionary, with figure converted to JSON.
         """
-        # add modebar before converting to dictionary
-        # todo dirty fix, but works for now
-        fig = self.figure.update_layout(modebar_add=["v1hovermode", "toggleSpikeLines"])
-        return {"title": self.title, "figure": pio.to_json(fig)}
+        if isinstance(self.figure, go.Figure):
+            if not self.compact:
+                # add modebar before converting to dictionary
+                # todo dirty fix, but works for now
+                fig = self.figure.update_layout(modebar_add=MODEBAR_BUTTONS)
+                return {"title": self.title, "figure": pio.to_json(fig)}
+            # a copy of the figure, which is left untouched
+            fig = self.figure.to_plotly_json()
+        else:
+            fig = {"data": self.figure["data"], "layout": dict(self.figure["layout"])}
+
+        fig["layout"]["modebar"] = {"add": MODEBAR_BUTTONS}
+        if not self.compact:
+            fig["layout"]["template"] = plotly_template()
+            return {
+                "title": self.title,
+                "figure": pio.json.to_json_plotly(fig, engine=FIGURE_JSON_ENGINE),
+            }
+
+        fig["layout"].pop("template", None)
+        fig = _round_floats(fig, FIGURE_FLOAT_DIGITS)
+        return {
+            "title": self.title,
+            "figure": pio.json.to_json_plotly(fig, engine=FIGURE_JSON_ENGINE),
+            "template": pio.templates.default,
+        }
 
 
 class IVisualizationDriver(ABC):
@@ -61,14 +300,26 @@ class IVisualizationDriver(ABC):
     Abstract base class for visualization drivers.
     """
 
+    # the aggregated chart drawn by the driver, see `aggregates.Aggregates`, and the
+    # columns it is computed from which aren't in the userlist and are filled in by
+    # the visualizer, like `series_genre_mask`
+    name: str
+    required_columns: tuple[str, ...] = ()
+    # the title of the chart and how clients draw it from its data
+    title: str
+    chart: ChartSpec
+
     # from myanimelist's list of explicit genres
     NSFW_GENRES = ("Erotica", "Ecchi", "Hentai")
     IGNORE_GENRES = ("Avant Garde", "Award Winning")
 
-    def __init__(self, df: pd.DataFrame, opts: VisualizationOptions) -> None:
-        self.df = df
+    def __init__(self, data: ChartSeries | None, opts: VisualizationOptions) -> None:
+        """
+        `data` is the chart's data, see `aggregates.UserlistAggregator`.
+        It is `None` when there isn't enough data to draw the chart.
+        """
+        self.data = data
         self.opts = opts
-        plt_use("agg")
         # pio.templates.default = "seaborn"
 
     @staticmethod
@@ -94,6 +345,39 @@ class IVisualizationDriver(ABC):
         buf.close()
         return image
 
+    def plotly_result(
+        self, title: str, fig: go.Figure | dict
+    ) -> PlotlyVisualizationResult:
+        return PlotlyVisualizationResult(title, fig, self.opts.compact_figures)
+
+    def image_result(
+        self, title: str, fig: PltFigure
+    ) -> MatplotlibVisualizationResult | ImageVisualizationResult:
+        """
+        Takes a matplotlib `Figure` and returns its result, inlined as a base64 PNG or,
+        if the image is to be served from the chart store, as binary.
+        """
+        if not self.opts.image_urls:
+            return MatplotlibVisualizationResult(
+                title, self.b64_image_from_plt_fig(fig)
+            )
+
+        buf = BytesIO()
+        fig.savefig(buf, format=CHART_IMAGE_FORMAT, dpi=CHART_IMAGE_DPI)
+        image = buf.getvalue()
+        buf.close()
+        return ImageVisualizationResult(title, image, CHART_IMAGE_FORMAT)
+
+    def visualize_data(self) -> MatplotlibVisualizationResult | DataVisualizationResult:
+        """
+        Returns only the data of the chart, nothing is drawn.
+        """
+        if self.data is None:
+            return MatplotlibVisualizationResult(
+                self.title, self.get_not_enough_data_image()
+            )
+        return DataVisualizationResult(self.title, self.chart, self.data)
+
     @abstractmethod
     def visualize(self) -> MatplotlibVisualizationResult | PlotlyVisualizationResult:
         """
@@ -1,99 +1,60 @@
-import heapq
-
-import matplotlib.pyplot as plt
-import pandas as pd
-import plotly.express as px
-
+from ..figures import figure_manager
 from .base import (
+    ChartSpec,
     IVisualizationDriver,
     MatplotlibVisualizationResult,
-    PlotlyVisualizationResult,
+    bar_trace,
+    hover_template,
+    xy_layout,
 )
-from .remaining_watching import trim_anime_title
 
 
 class FastestFinishedDriver(IVisualizationDriver):
-    def visualize(self):
-        final_ignored = self.NSFW_GENRES if self.opts.disable_nsfw else tuple()
+    name = "fastest_finished"
+    title = "Fastest Finished Anime"
+    chart = ChartSpec("bar", "Anime Names", "Episodes watched per day")
 
-        # filter anime which are completed and whose start and finish dates exist
-        df = self.df[
-            (self.df["my_status"] == "Completed")
-            & (self.df["my_start_date"] != "0000-00-00")
-            & (self.df["my_finish_date"] != "0000-00-00")
-            & (self.df["my_watched_episodes"] != 0)
-        ]
-
-        if len(df) == 0:
+    def visualize(self):
+        if self.data is None:
             return MatplotlibVisualizationResult(
                 "Fastest Finished Anime", self.get_not_enough_data_image()
             )
 
-        # convert date columns to actual dates
-        df.loc[:, "my_start_date"] = pd.to_datetime(
-            df["my_start_date"], format="ISO8601"
-        )
-        df.loc[:, "my_finish_date"] = pd.to_datetime(
-            df["my_finish_date"], format="ISO8601"
-        )
-
-        df.loc[:, "episode_day_ratio"] = (
-            df.loc[:, "my_finish_date"] - df.loc[:, "my_start_date"]
-        )
-        df.loc[:, "episode_day_ratio"] = df.loc[:, "episode_day_ratio"].apply(
-            lambda x: x.days if x.days > 0 else 1
-        )
-        df.loc[:, "episode_day_ratio"] = (
-            df.loc[:, "my_watched_episodes"] / df.loc[:, "episode_day_ratio"]
-        )
-
-        fastest_finished_tuple = heapq.nlargest(
-            10, zip(df["series_title"], df["episode_day_ratio"]), key=lambda t: t[1]
-        )
-        fastest_finished_titles = [
-            trim_anime_title(t[0], 15) for t in fastest_finished_tuple
-        ]
-        fastest_finished_ratio = [t[1] for t in fastest_finished_tuple]
+        fastest_finished_titles = self.data.labels
+        fastest_finished_ratio = self.data.series["episodes_per_day"]
 
         if self.opts.interactive_charts:
             # plotly code
-            df_plottable = pd.DataFrame(
-                {
-                    "Anime Names": fastest_finished_titles,
-                    "Episodes watched per day": fastest_finished_ratio,
-                }
-            )
-
-            fig = px.bar(
-                df_plottable,
-                x="Anime Names",
-                y="Episodes watched per day",
-                title="Fastest Finished Anime (by episodes watched per day)",
-                color_discrete_sequence=[
-                    "#FF9999",
-                    "#66B3FF",
-                    "#99FF99",
-                    "#FFCC99",
-                    "#FFD700",
-                    "#FF6347",
+            x_title, y_title = "Anime Names", "Episodes watched per day"
+            fig = {
+                "data": [
+                    bar_trace(
+                        fastest_finished_titles,
+                        fastest_finished_ratio,
+                        hover_template((x_title, "%{x}"), (y_title, "%{y}")),
+                        "#FF9999",
+                    )
                 ],
-            )
+                "layout": xy_layout(
+                    x_title,
+                    y_title,
+                    title="Fastest Finished Anime (by episodes watched per day)",
+                ),
+            }
 
-            return PlotlyVisualizationResult("Fastest Finished Anime", fig)
+            return self.plotly_result("Fastest Finished Anime", fig)
 
         # matplotlib code
-        fig, ax = plt.subplots()
-        ax.set_title("Fastest Finished Anime (by episodes watched per day)")
-        ax.set_xlabel("Anime Names")
-        ax.set_ylabel("Episodes watched per day")
-        bar = ax.bar(
-            fastest_finished_titles,
-            fastest_finished_ratio,
-            color=["#FF9999", "#66B3FF", "#99FF99", "#FFCC99", "#FFD700", "#FF6347"],
-        )
-        ax.bar_label(bar)
-        fig.autofmt_xdate()  # rotate xticks
+        with figure_manager.subplots() as (fig, ax):
+            ax.set_title("Fastest Finished Anime (by episodes watched per day)")
+            ax.set_xlabel("Anime Names")
+            ax.set_ylabel("Episodes watched per day")
+            bar = ax.bar(
+                fastest_finished_titles,
+                fastest_finished_ratio,
+                color=["#FF9999", "#66B3FF", "#99FF99", "#FFCC99", "#FFD700", "#FF6347"],
+            )
+            ax.bar_label(bar)
+            fig.autofmt_xdate()  # rotate xticks
 
-        return MatplotlibVisualizationResult(
-            "Fastest Finished Anime", self.b64_image_from_plt_fig(fig)
-        )
+            return self.image_result("Fastest Finished Anime", fig)
@@ -1,77 +1,65 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import plotly.express as px
-
+from ..figures import figure_manager
 from .base import (
+    ChartSpec,
     IVisualizationDriver,
     MatplotlibVisualizationResult,
-    PlotlyVisualizationResult,
+    hover_template,
+    pie_layout,
+    pie_trace,
 )
 
 
 class FormatDistributionDriver(IVisualizationDriver):
+    name = "format_distribution"
+    required_columns = ("series_genre_mask",)
+    title = "Format Distribution"
+    chart = ChartSpec("pie", hole=0.1)
+
     def visualize(self):
-        if len(self.df) == 0:
+        if self.data is None:
             return MatplotlibVisualizationResult(
                 "Format Distribution", self.get_not_enough_data_image()
             )
 
-        final_ignored = self.IGNORE_GENRES + (
-            self.NSFW_GENRES if self.opts.disable_nsfw else tuple()
-        )
-        formats = dict()
-        series_type = self.df["series_type"]
-        for i, genres in enumerate(self.df["series_genres"]):
-            for genre in genres:
-                if genre in final_ignored or series_type[i] in (
-                    "PV",
-                    "Music",
-                    "Unknown",
-                ):
-                    continue
-                if formats.get(series_type[i]):
-                    formats[series_type[i]] += 1
-                else:
-                    formats[series_type[i]] = 1
+        formats = dict(zip(self.data.labels, self.data.series["count"]))
 
         if self.opts.interactive_charts:
             # pie chart using plotly
-            df_plottable = pd.DataFrame(formats.items(), columns=["Format", "Count"])
-            total = df_plottable["Count"].sum()
-            df_plottable.loc[:, "Percentage"] = (
-                df_plottable.loc[:, "Count"] / total * 100
-            )
-            df_plottable.loc[:, "Percentage"] = df_plottable.loc[:, "Percentage"].apply(
-                lambda x: round(x, 2)
-            )
-
-            fig = px.pie(
-                df_plottable,
-                values="Count",
-                names="Format",
-                title="Format Distribution",
-                hole=0.1,
-                labels={"Percentage": "Percentage"},
-                hover_data=["Percentage"],
-            )
-            fig.update_traces(textposition="inside", textinfo="percent+label")
-            return PlotlyVisualizationResult("Format Distribution", fig)
+            total = sum(formats.values())
+            percentages = [[round(c / total * 100, 2)] for c in formats.values()]
+            fig = {
+                "data": [
+                    pie_trace(
+                        list(formats.keys()),
+                        list(formats.values()),
+                        hover_template(
+                            ("Format", "%{label}"),
+                            ("Count", "%{value}"),
+                            ("Percentage", "%{customdata[0]}"),
+                        ),
+                        0.1,
+                        customdata=percentages,
+                        textinfo="percent+label",
+                        textposition="inside",
+                    )
+                ],
+                "layout": pie_layout("Format Distribution"),
+            }
+            return self.plotly_result("Format Distribution", fig)
 
         # pie chart using matplotlib
-        fig, ax = plt.subplots()
-        ax.axis("equal")
-        ax.set_title("Anime Format Distribution")
-        explode = [0 if i % 2 else 0.1 for i in range(len(formats))]
-        ax.pie(
-            formats.values(),
-            labels=formats.keys(),
-            explode=explode,
-            shadow=True,
-            autopct="%1.1f%%",
-            labeldistance=1.2,
-            pctdistance=0.6,
-        )
+        with figure_manager.subplots() as (fig, ax):
+            ax.axis("equal")
+            ax.set_title("Anime Format Distribution")
+            explode = [0 if i % 2 else 0.1 for i in range(len(formats))]
+            ax.pie(
+                formats.values(),
+                labels=formats.keys(),
+                explode=explode,
+                shadow=True,
+                autopct="%1.1f%%",
+                labeldistance=1.2,
+                pctdistance=0.6,
+            )
 
-        return MatplotlibVisualizationResult(
-            "Format Distribution", self.b64_image_from_plt_fig(fig)
-        )
+            return self.image_result("Format Distribution", fig)
@@ -1,54 +1,57 @@
-from collections import Counter
-
-import plotly.express as px
-from matplotlib import pyplot as plt
-
+from ..figures import figure_manager
 from .base import (
+    ChartSpec,
     IVisualizationDriver,
     MatplotlibVisualizationResult,
-    PlotlyVisualizationResult,
+    bar_trace,
+    hover_template,
+    xy_layout,
 )
 
 
 class RatingsCurveDriver(IVisualizationDriver):
+    name = "ratings_curve"
+    title = "Ratings Curve"
+    chart = ChartSpec("bar", "Rating Value (1-10)", "Rating Count")
+
     def visualize(self):
-        df = self.df[self.df["my_score"] != 0]
-        if len(df) == 0:
+        if self.data is None:
             return MatplotlibVisualizationResult(
                 "Ratings Curve", self.get_not_enough_data_image()
             )
 
-        if self.opts.interactive_charts:
-            # plotly code
-            ratings = df["my_score"].value_counts().sort_index()
+        ratings = dict(zip(self.data.labels, self.data.series["count"]))
 
-            fig = px.bar(
-                x=ratings.index,
-                y=ratings.values,
-                labels={"x": "Rating Value (1-10)", "y": "Rating Count"},
-            )
-            fig.update_xaxes(
+        if self.opts.interactive_charts:
+            # plotly code, only the ratings which were given
+            given = {k: v for k, v in ratings.items() if v}
+
+            x_title, y_title = "Rating Value (1-10)", "Rating Count"
+            fig = {
+                "data": [
+                    bar_trace(
+                        list(given.keys()),
+                        list(given.values()),
+                        hover_template((x_title, "%{x}"), (y_title, "%{y}")),
+                        "skyblue",
+                        opacity=0.7,
+                    )
+                ],
+                "layout": xy_layout(x_title, y_title),
+            }
+            fig["layout"]["xaxis"].update(
                 type="category", tickmode="array", tickvals=list(range(1, 11))
             )
-            fig.update_traces(marker_color="skyblue", opacity=0.7)
-            fig.update_layout(
-                title="Ratings Distribution",
-                xaxis_title="Rating Value (1-10)",
-                yaxis_title="Rating Count",
-            )
-            return PlotlyVisualizationResult("Ratings Curve", fig)
+            fig["layout"]["title"] = {"text": "Ratings Distribution"}
+            return self.plotly_result("Ratings Curve", fig)
 
         # matplotlib code
-        ratings = Counter(df["my_score"])
-
-        fig, ax = plt.subplots()
-        ax.set_title("Ratings Distribution")
-        ax.set_ylabel("Rating Count")
-        ax.set_xlabel("Rating Value (1-10)")
-        ax.set_xticks(range(1, 11))
-        ratings_bar = ax.bar(range(1, 11), [ratings[i] for i in range(1, 11)])
-        ax.bar_label(ratings_bar)
-
-        return MatplotlibVisualizationResult(
-            "Ratings Curve", self.b64_image_from_plt_fig(fig)
-        )
+        with figure_manager.subplots() as (fig, ax):
+            ax.set_title("Ratings Distribution")
+            ax.set_ylabel("Rating Count")
+            ax.set_xlabel("Rating Value (1-10)")
+            ax.set_xticks(range(1, 11))
+            ratings_bar = ax.bar(range(1, 11), [ratings[i] for i in range(1, 11)])
+            ax.bar_label(ratings_bar)
+
+            return self.image_result("Ratings Curve", fig)
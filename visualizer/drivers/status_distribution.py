@@ -1,31 +1,50 @@
-import plotly.express as px
-from .base import IVisualizationDriver, MatplotlibVisualizationResult, PlotlyVisualizationResult
+import pandas as pd
+from plotly.colors import qualitative
+from ..figures import figure_manager
+from .base import (
+    ChartSpec,
+    IVisualizationDriver,
+    MatplotlibVisualizationResult,
+    hover_template,
+    pie_layout,
+    pie_trace,
+)
 
 class StatusDistributionDriver(IVisualizationDriver):
+    name = "status_distribution"
+    title = "List Status Breakdown"
+    chart = ChartSpec("pie", hole=0.4)
+
     def visualize(self):
-        if len(self.df) == 0:
+        if self.data is None:
             return MatplotlibVisualizationResult(
                 "List Status Breakdown", self.get_not_enough_data_image()
             )
 
-        status_counts = self.df["my_status"].value_counts().reset_index()
-        status_counts.columns = ["Status", "Count"]
+        status_counts = pd.DataFrame(
+            {"Status": self.data.labels, "Count": self.data.series["count"]}
+        )
 
         if self.opts.interactive_charts:
-            fig = px.pie(
-                status_counts, 
-                values="Count", 
-                names="Status", 
-                hole=0.4, 
-                title="List Status Breakdown",
-                color_discrete_sequence=px.colors.qualitative.Pastel
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            return PlotlyVisualizationResult("List Status Breakdown", fig)
+            fig = {
+                "data": [
+                    pie_trace(
+                        self.data.labels,
+                        self.data.series["count"],
+                        hover_template(("Status", "%{label}"), ("Count", "%{value}")),
+                        0.4,
+                        textinfo="percent+label",
+                        textposition="inside",
+                    )
+                ],
+                "layout": pie_layout(
+                    "List Status Breakdown", piecolorway=qualitative.Pastel
+                ),
+            }
+            return self.plotly_result("List Status Breakdown", fig)
 
         # Matplotlib fallback
-        import matplotlib.pyplot as plt
-        fig, ax = plt.subplots(figsize=(8, 8))
-        ax.pie(status_counts["Count"], labels=status_counts["Status"], autopct='%1.1f%%', startangle=140, wedgeprops=dict(width=0.4))
-        ax.set_title("List Status Breakdown")
-        return MatplotlibVisualizationResult("List Status Breakdown", self.b64_image_from_plt_fig(fig))
+        with figure_manager.subplots(figsize=(8, 8)) as (fig, ax):
+            ax.pie(status_counts["Count"], labels=status_counts["Status"], autopct='%1.1f%%', startangle=140, wedgeprops=dict(width=0.4))
+            ax.set_title("List Status Breakdown")
+            return self.image_result("List Status Breakdown", fig)
@@ -0,0 +1,84 @@
+import os
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+
+from dotenv import load_dotenv
+from matplotlib.backend_bases import FigureCanvasBase
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+load_dotenv("./credentials.env")
+
+# matplotlib figures which can be open at once in a worker, others wait for one to be released
+MAX_OPEN_FIGURES = int(os.getenv("MAX_OPEN_FIGURES", "8"))
+# format and resolution of the chart images served from the chart store
+CHART_IMAGE_FORMAT = os.getenv("CHART_IMAGE_FORMAT", "png")
+CHART_IMAGE_DPI = int(os.getenv("CHART_IMAGE_DPI", "100"))
+
+IMAGE_MIMETYPES = {
+    "png": "image/png",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+if CHART_IMAGE_FORMAT not in IMAGE_MIMETYPES:
+    raise ValueError(
+        f"CHART_IMAGE_FORMAT must be one of {', '.join(IMAGE_MIMETYPES)}, "
+        f"not {CHART_IMAGE_FORMAT!r}"
+    )
+
+
+class FigureManager:
+    """
+    Owns the matplotlib figures drawn by the drivers.
+
+    Figures are plain `matplotlib.figure.Figure` objects, pyplot never keeps a reference to
+    them, and they are cleared and detached from their canvas as soon as the chart has been
+    saved, so their memory is reclaimed right away instead of by the garbage collector.
+    At most `max_open` figures exist at once.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_FIGURES) -> None:
+        self.max_open = max_open
+        self._slots = BoundedSemaphore(max_open)
+        self._lock = Lock()
+        self.open = 0
+        self.peak = 0
+        self.created = 0
+
+    @contextmanager
+    def subplots(self, **fig_kw):
+        """
+        Yields a new figure and its axes, like `pyplot.subplots`. The figure is released
+        when the block exits and must not be used after that.
+        """
+        with self._slots:
+            fig = Figure(**fig_kw)
+            FigureCanvasAgg(fig)
+            with self._lock:
+                self.open += 1
+                self.created += 1
+                self.peak = max(self.peak, self.open)
+            try:
+                yield fig, fig.subplots()
+            finally:
+                self.release(fig)
+
+    def release(self, fig: Figure):
+        # drops the artists and the agg canvas along with its pixel buffer
+        fig.clear()
+        FigureCanvasBase(fig)
+        with self._lock:
+            self.open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "peak": self.peak,
+                "created": self.created,
+                "max_open": self.max_open,
+            }
+
+
+figure_manager = FigureManager()
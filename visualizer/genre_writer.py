@@ -0,0 +1,238 @@
+import atexit
+import logging
+import os
+import queue
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Lock, Thread
+
+from dotenv import load_dotenv
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session, sessionmaker
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from database import engine
+from models import Anime, AnimeGenre, AnimeLookupMiss, Genre
+
+load_dotenv("./credentials.env")
+
+GENRE_WRITER_BATCH_SIZE = int(os.getenv("GENRE_WRITER_BATCH_SIZE", "200"))
+GENRE_WRITER_FLUSH_INTERVAL = float(os.getenv("GENRE_WRITER_FLUSH_INTERVAL", "2"))
+GENRE_WRITER_QUEUE_SIZE = int(os.getenv("GENRE_WRITER_QUEUE_SIZE", "20000"))
+
+# how long anime which couldn't be resolved are skipped for, per miss reason
+LOOKUP_MISS_TTL = {
+    AnimeLookupMiss.NOT_FOUND: timedelta(
+        days=int(os.getenv("LOOKUP_MISS_NOT_FOUND_TTL_DAYS", "30"))
+    ),
+    AnimeLookupMiss.NO_GENRES: timedelta(
+        days=int(os.getenv("LOOKUP_MISS_NO_GENRES_TTL_DAYS", "7"))
+    ),
+}
+
+# keeps the multi row statements well below mysql's max_allowed_packet
+UPSERT_CHUNK_SIZE = 1000
+
+
+@dataclass(frozen=True, slots=True)
+class DiscoveredAnime:
+    """
+    An anime, along with its genres, fetched from the MAL API.
+    """
+
+    id: int
+    title: str
+    genres: tuple[tuple[int, str], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class LookupMiss:
+    """
+    An anime whose genres couldn't be resolved, see `AnimeLookupMiss`.
+    """
+
+    anime_id: int
+    reason: str
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _chunks(rows: list, size: int = UPSERT_CHUNK_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+def upsert_discovered_anime(session: Session, discovered: list[DiscoveredAnime]):
+    """
+    Inserts the anime, their genres and the anime-genre associations with multi row
+    `INSERT ... ON DUPLICATE KEY UPDATE` statements, so that concurrent writers of the
+    same anime don't fail each other.
+    """
+    genre_rows = list(
+        {
+            genre_id: {"id": genre_id, "name": name}
+            for d in discovered
+            for genre_id, name in d.genres
+        }.values()
+    )
+    for chunk in _chunks(genre_rows):
+        stmt = mysql_insert(Genre).values(chunk)
+        session.execute(stmt.on_duplicate_key_update(name=stmt.inserted.name))
+
+    anime_rows = [{"id": d.id, "name": d.title} for d in discovered]
+    for chunk in _chunks(anime_rows):
+        stmt = mysql_insert(Anime).values(chunk)
+        session.execute(stmt.on_duplicate_key_update(name=stmt.inserted.name))
+
+    # an anime whose title clashes with another one's isn't inserted, skip its genres
+    stored_ids = {
+        id_
+        for chunk in _chunks([d.id for d in discovered])
+        for (id_,) in session.query(Anime.id).filter(Anime.id.in_(chunk))
+    }
+    anime_genre_rows = [
+        {"anime_id": d.id, "genre_id": genre_id}
+        for d in discovered
+        if d.id in stored_ids
+        for genre_id, _ in d.genres
+    ]
+    for chunk in _chunks(anime_genre_rows):
+        stmt = mysql_insert(AnimeGenre).values(chunk)
+        session.execute(stmt.on_duplicate_key_update(genre_id=stmt.inserted.genre_id))
+
+
+def upsert_lookup_misses(session: Session, misses: list[LookupMiss]):
+    """
+    Inserts or refreshes the given lookup misses, each expiring as per `LOOKUP_MISS_TTL`.
+    """
+    now = _utcnow()
+    rows = [
+        {
+            "anime_id": m.anime_id,
+            "reason": m.reason,
+            "expires_at": now + LOOKUP_MISS_TTL[m.reason],
+        }
+        for m in misses
+    ]
+    for chunk in _chunks(rows):
+        stmt = mysql_insert(AnimeLookupMiss).values(chunk)
+        session.execute(
+            stmt.on_duplicate_key_update(
+                reason=stmt.inserted.reason, expires_at=stmt.inserted.expires_at
+            )
+        )
+
+
+class GenreWriter:
+    """
+    Write-behind queue for anime and genres discovered while serving requests.
+
+    Requests only enqueue what they found, a background thread drains the queue and
+    writes it to the database in batches of up to `batch_size` items, at least every
+    `flush_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = GENRE_WRITER_BATCH_SIZE,
+        flush_interval: float = GENRE_WRITER_FLUSH_INTERVAL,
+        queue_size: int = GENRE_WRITER_QUEUE_SIZE,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue[DiscoveredAnime | LookupMiss] = queue.Queue(queue_size)
+        self._session_factory = sessionmaker(bind=engine, autoflush=False)
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._thread: Thread | None = None
+        self._pid: int | None = None
+        self.dropped = 0
+
+    def _ensure_started(self):
+        # threads don't survive a fork, start one per process lazily
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = Thread(target=self._run, name="genre-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _put(self, item: DiscoveredAnime | LookupMiss):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # never make a request wait, the item will be rediscovered later
+            self.dropped += 1
+            logging.warning(f"genre writer queue is full, dropping {item}")
+
+    def put_anime(self, anime: Anime, genres: list[Genre]):
+        self._put(
+            DiscoveredAnime(
+                int(anime.id),
+                anime.name,
+                tuple((int(g.id), g.name) for g in genres),
+            )
+        )
+
+    def put_lookup_misses(self, misses: dict[int, str]):
+        for anime_id, reason in misses.items():
+            self._put(LookupMiss(anime_id, reason))
+
+    def _drain(self, first=None, timeout: float = 0.0):
+        """
+        Collects up to `batch_size` items from the queue, waiting at most `timeout` seconds
+        for them to arrive.
+        """
+        items = [] if first is None else [first]
+        ends_at = time.monotonic() + timeout
+        while len(items) < self.batch_size:
+            remaining = ends_at - time.monotonic()
+            try:
+                if remaining > 0:
+                    items.append(self._queue.get(timeout=remaining))
+                else:
+                    items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _write(self, items: list[DiscoveredAnime | LookupMiss]):
+        # the last write of an anime in the batch wins
+        discovered = {i.id: i for i in items if isinstance(i, DiscoveredAnime)}
+        misses = {i.anime_id: i for i in items if isinstance(i, LookupMiss)}
+
+        with self._flush_lock, self._session_factory() as session:
+            try:
+                if discovered:
+                    upsert_discovered_anime(session, list(discovered.values()))
+                if misses:
+                    upsert_lookup_misses(session, list(misses.values()))
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logging.error(f"unable to write a batch of {len(items)} genre items")
+                logging.exception(e)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            self._write(self._drain(first, self.flush_interval))
+
+    def flush(self):
+        """
+        Synchronously writes everything currently in the queue.
+        """
+        while items := self._drain():
+            self._write(items)
+
+
+genre_writer = GenreWriter()
+atexit.register(genre_writer.flush)
@@ -0,0 +1,63 @@
+from typing import Iterable
+
+import numpy as np
+
+# the genres tracked by animeviz, the position of a genre is its bit in a genre mask
+GENRES = (
+    "Action",
+    "Adventure",
+    "Comedy",
+    "Drama",
+    "Fantasy",
+    "Gourmet",
+    "Horror",
+    "Isekai",
+    "Mystery",
+    "Romance",
+    "Sci-Fi",
+    "Slice of Life",
+    "Sports",
+    "Suspense",
+    "Erotica",
+    "Ecchi",
+    "Hentai",
+)
+KNOWN_GENRES = frozenset(GENRES)
+
+GENRE_BITS = {g: 1 << i for i, g in enumerate(GENRES)}
+_BIT_VALUES = np.array([GENRE_BITS[g] for g in GENRES], dtype=np.uint32)
+
+
+def genre_mask(genres: Iterable[str]) -> int:
+    """
+    Returns the bitmask of the given genres, unknown genres are ignored.
+    """
+    mask = 0
+    for g in genres:
+        mask |= GENRE_BITS.get(g, 0)
+    return mask
+
+
+def encode_genres(genre_lists: Iterable[Iterable[str]]) -> np.ndarray:
+    """
+    Encodes every list of genre names as a bitmask.
+    """
+    return np.fromiter((genre_mask(g) for g in genre_lists), dtype=np.uint32)
+
+
+def genre_matrix(masks) -> np.ndarray:
+    """
+    Expands the genre bitmasks to a boolean one-hot matrix of shape (len(masks), len(GENRES)),
+    column `i` tells if the anime is of genre `GENRES[i]`.
+    """
+    masks = np.asarray(masks, dtype=np.uint32)
+    return (masks[:, None] & _BIT_VALUES) != 0
+
+
+def genre_columns(excluded: Iterable[str] = ()) -> np.ndarray:
+    """
+    Returns a boolean array selecting the columns of `genre_matrix` not in `excluded`.
+    """
+    excluded = set(excluded)
+    return np.array([g not in excluded for g in GENRES])
+
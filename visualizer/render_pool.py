@@ -0,0 +1,84 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from threading import Lock
+
+from dotenv import load_dotenv
+
+from .drivers.base import IVisualizationDriver
+
+load_dotenv("./credentials.env")
+
+# number of processes drivers are rendered in, 0 renders them in the request worker itself
+VISUALIZER_PROCESSES = int(os.getenv("VISUALIZER_PROCESSES", "0"))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_pid: int | None = None
+_pool_lock = Lock()
+
+
+def _init_render_process():
+    # pay for the heavy imports and matplotlib's font cache once per render process
+    import matplotlib.backends.backend_agg  # noqa: F401
+    import matplotlib.font_manager  # noqa: F401
+
+
+def _noop():
+    return os.getpid()
+
+
+def render(driver: IVisualizationDriver):
+    """
+    Runs in a render process, returns the result of the driver.
+    """
+    return driver.visualize()
+
+
+def get_render_pool() -> ProcessPoolExecutor | None:
+    """
+    Returns the render process pool of this worker, creating it if needed.
+    Returns `None` if drivers shouldn't be rendered in separate processes.
+    """
+    global _pool, _pool_pid
+
+    if VISUALIZER_PROCESSES <= 0:
+        return None
+
+    # a pool inherited through a fork belongs to the parent, never reuse it
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # forkserver children don't inherit the threads and sockets of the worker
+            _pool = ProcessPoolExecutor(
+                max_workers=VISUALIZER_PROCESSES,
+                mp_context=multiprocessing.get_context("forkserver"),
+                initializer=_init_render_process,
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def warm_render_pool():
+    """
+    Starts every process of the render pool so that the first requests don't pay for it.
+    """
+    pool = get_render_pool()
+    if pool is None:
+        return
+    wait([pool.submit(_noop) for _ in range(VISUALIZER_PROCESSES)])
+
+
+def discard_render_pool():
+    """
+    Drops a broken render pool, the next `get_render_pool` call creates a new one.
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            logging.warning("discarding the render process pool")
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
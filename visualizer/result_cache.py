@@ -0,0 +1,249 @@
+import logging
+import os
+import sys
+import time
+import zlib
+from dataclasses import astuple
+from datetime import date
+from pathlib import Path
+from threading import Lock
+from typing import Iterable
+
+import pandas as pd
+import redis
+from dotenv import load_dotenv
+
+from .aggregates import CHARTS
+from .cache import get_redis_client
+from .drivers.base import VisualizationOptions
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from userlist import userlist_fingerprint
+
+load_dotenv("./credentials.env")
+
+# total size of the cached results, 0 disables the cache
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# results are recomputed after this many seconds, so that genres fetched since are used
+RESULT_CACHE_MAX_AGE = int(os.getenv("RESULT_CACHE_MAX_AGE", str(24 * 60 * 60)))
+# results are stored here when there's no redis to store them in
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "./.result_cache")
+
+# bump when the results change for the same list and options
+RESULT_CACHE_VERSION = 1
+
+
+class RedisResultStore:
+    """
+    Stores results in redis, every entry expires after `max_age` seconds.
+    The least recently used entries are evicted once their total size exceeds `max_bytes`,
+    the access times and sizes are kept in a sorted set and a hash next to the entries.
+    """
+
+    KEY_PREFIX = "animeviz:results:"
+    LRU_KEY = "animeviz:results-lru"
+    SIZES_KEY = "animeviz:results-sizes"
+    TOTAL_KEY = "animeviz:results-total"
+
+    def __init__(self, client: redis.Redis, max_bytes: int, max_age: int) -> None:
+        self.client = client
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def _key(self, key: str):
+        return f"{self.KEY_PREFIX}{key}"
+
+    def get(self, key: str) -> bytes | None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self._key(key))
+        pipe.zadd(self.LRU_KEY, {key: time.time()}, xx=True)
+        value, _ = pipe.execute()
+        return value
+
+    def set(self, key: str, value: bytes) -> int:
+        """
+        Stores the value, returns the number of entries evicted to make room for it.
+        """
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), value, ex=self.max_age)
+        pipe.zadd(self.LRU_KEY, {key: time.time()})
+        pipe.hget(self.SIZES_KEY, key)
+        pipe.hset(self.SIZES_KEY, key, len(value))
+        pipe.incrby(self.TOTAL_KEY, len(value))
+        *_, previous_size, _, total = pipe.execute()
+        if previous_size is not None:
+            total = self.client.decrby(self.TOTAL_KEY, int(previous_size))
+
+        evicted = 0
+        while total > self.max_bytes:
+            # expired entries are the least recently used ones, they go first
+            oldest = self.client.zpopmin(self.LRU_KEY)
+            if not oldest:
+                break
+            member = oldest[0][0].decode()
+            size = int(self.client.hget(self.SIZES_KEY, member) or 0)
+            pipe = self.client.pipeline()
+            pipe.delete(self._key(member))
+            pipe.hdel(self.SIZES_KEY, member)
+            pipe.decrby(self.TOTAL_KEY, size)
+            *_, total = pipe.execute()
+            evicted += 1
+        return evicted
+
+
+class DiskResultStore:
+    """
+    Stores results as files in a directory, the modification time of a file is the last
+    time it was used. Entries older than `max_age` seconds are ignored, and the least
+    recently used ones are evicted once their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_age: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = Lock()
+
+    def _path(self, key: str):
+        return self.directory / f"{key}.bin"
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                created_at = float(f.readline())
+                if created_at + self.max_age < time.time():
+                    path.unlink(missing_ok=True)
+                    return None
+                value = f.read()
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes) -> int:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # written under another name first, readers never see a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(f"{time.time()}\n".encode())
+            f.write(value)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            Path(path).unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+
+class ResultCache:
+    """
+    Cache of serialized `/visualize` responses, keyed by the fingerprint of the animelist
+    and the visualization options. Values are compressed before being stored.
+    """
+
+    def __init__(self, store: RedisResultStore | DiskResultStore | None) -> None:
+        self.store = store
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls):
+        if RESULT_CACHE_MAX_BYTES <= 0:
+            return cls(None)
+        client = get_redis_client()
+        if client is not None:
+            return cls(
+                RedisResultStore(client, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_AGE)
+            )
+        return cls(
+            DiskResultStore(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_AGE)
+        )
+
+    @staticmethod
+    def key(
+        df: pd.DataFrame, opts: VisualizationOptions, charts: Iterable[str] = CHARTS
+    ) -> str:
+        """
+        Returns the cache key of the results of the given charts of a prepared animelist.
+        The date is part of the key since some charts depend on it.
+        """
+        opts_key = "-".join(str(int(v)) for v in astuple(opts))
+        # the selected charts as a bitmask of their positions in CHARTS
+        charts_key = format(sum(1 << CHARTS.index(c) for c in set(charts)), "x")
+        return (
+            f"v{RESULT_CACHE_VERSION}-{userlist_fingerprint(df)}-{opts_key}"
+            f"-{charts_key}-{date.today().isoformat()}"
+        )
+
+    def get(self, key: str) -> str | None:
+        """
+        Returns the cached serialized results, or `None`.
+        """
+        if self.store is None:
+            return None
+        try:
+            value = self.store.get(key)
+        except (redis.RedisError, OSError, ValueError) as e:
+            logging.warning(f"unable to read cached results: {e}")
+            with self._lock:
+                self.errors += 1
+            return None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return zlib.decompress(value).decode()
+
+    def set(self, key: str, results: str):
+        if self.store is None:
+            return
+        try:
+            evicted = self.store.set(key, zlib.compress(results.encode(), 1))
+        except (redis.RedisError, OSError) as e:
+            logging.warning(f"unable to cache results: {e}")
+            with self._lock:
+                self.errors += 1
+            return
+
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.store).__name__ if self.store else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
+
+
+result_cache = ResultCache.from_env()
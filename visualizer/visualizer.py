@@ -1,17 +1,30 @@
+import base64
 import logging
 import os
-from concurrent.futures import ThreadPoolExecutor
+import sys
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
 
 import pandas as pd
 from dotenv import load_dotenv
 
-from .api_helper import get_anime_genres
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from userlist import prepare_userlist_df
+
+from .aggregates import CHARTS, UserlistAggregator
+from .api_helper import get_anime_genres_bulk
+from .chart_store import chart_store
 from .drivers.base import (
+    DataVisualizationResult,
+    ImageVisualizationResult,
     IVisualizationDriver,
     MatplotlibVisualizationResult,
     PlotlyVisualizationResult,
     VisualizationOptions,
+    plotly_template,
 )
 from .drivers.courwise_ratings import CourwiseRatingsDriver
 from .drivers.fastest_finished import FastestFinishedDriver
@@ -22,49 +35,112 @@ from .drivers.monthwise_count import MonthwiseCountDriver
 from .drivers.ratings_curve import RatingsCurveDriver
 from .drivers.remaining_watching import RemainingCountDriver
 from .drivers.status_distribution import StatusDistributionDriver
+from .genres import encode_genres
+from .render_pool import discard_render_pool, get_render_pool, render
 
 load_dotenv("./credentials.env")
 
 MAX_ANIME_SEARCH_THREADS = int(os.environ["MAX_ANIME_SEARCH_THREADS"])
 
+# every driver by the name of its chart, in the order they are drawn in
+DRIVERS: dict[str, type[IVisualizationDriver]] = {
+    d.name: d
+    for d in (
+        MonthwiseCountDriver,
+        CourwiseRatingsDriver,
+        GenreDistributionDriver,
+        GenrewiseRatingsDriver,
+        RatingsCurveDriver,
+        RemainingCountDriver,
+        FormatDistributionDriver,
+        StatusDistributionDriver,
+        FastestFinishedDriver,
+    )
+}
+assert tuple(DRIVERS) == CHARTS
+
+
+def resolve_genres(df: pd.DataFrame) -> pd.Series:
+    # genres are stored as bitmasks, see genres.py
+    return encode_genres(
+        get_anime_genres_bulk(df["series_animedb_id"], MAX_ANIME_SEARCH_THREADS)
+    )
+
+
+# how the columns drivers require are filled in, only when a selected driver needs one
+ENRICHMENTS = {
+    "series_genre_mask": resolve_genres,
+}
+
+
+def parse_charts(value: str | None) -> tuple[str, ...]:
+    """
+    Parses a comma separated list of chart names, every chart if it is empty.
+    The charts are returned in the order they are drawn in.
+    Raises `ValueError` if a chart is unknown.
+    """
+    names = {n.strip() for n in (value or "").split(",") if n.strip()}
+    if not names:
+        return CHARTS
+    unknown = names.difference(DRIVERS)
+    if unknown:
+        raise ValueError(f"unknown charts: {', '.join(sorted(unknown))}")
+    return tuple(n for n in CHARTS if n in names)
+
 
 @dataclass(frozen=True)
 class VisualizationResult:
     """
-    A generic data class which wraps around `MatplotlibVisualizationResult`
-    and `PlotlyVisualizationResult` and is ultimately returned to the frontend.
+    A generic data class which wraps around `MatplotlibVisualizationResult`,
+    `PlotlyVisualizationResult` and `DataVisualizationResult` and is ultimately returned
+    to the frontend.
     """
 
     interactive: bool
-    result: MatplotlibVisualizationResult | PlotlyVisualizationResult
+    result: (
+        MatplotlibVisualizationResult
+        | PlotlyVisualizationResult
+        | DataVisualizationResult
+    )
+    data_only: bool = False
 
     def as_dict(self):
-        return {"interactive": self.interactive, "result": self.result.as_dict()}
+        return {
+            "interactive": self.interactive,
+            "data_only": self.data_only,
+            "result": self.result.as_dict(),
+        }
 
 
 class Visualizer:
-    def __init__(self, df: pd.DataFrame, opts: VisualizationOptions) -> None:
+    """
+    Draws the visualizations of an animelist, every one of them unless `charts` names
+    some. The dataframe must have been prepared with `userlist.prepare_userlist_df`.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        opts: VisualizationOptions,
+        charts: Iterable[str] = CHARTS,
+    ) -> None:
         self.df = df
         self.opts = opts
+        drivers = [DRIVERS[name] for name in charts]
 
-        anime_ids = df["series_animedb_id"]
-        with ThreadPoolExecutor(
-            max_workers=min(len(anime_ids), MAX_ANIME_SEARCH_THREADS)
-        ) as pool:
-            results = pool.map(get_anime_genres, anime_ids, timeout=10)
+        # only the columns the selected drivers need are filled in
+        required = {c for d in drivers for c in d.required_columns}
+        for column, enrich in ENRICHMENTS.items():
+            if column in required:
+                self.df.loc[:, column] = enrich(self.df)
 
-        self.df.loc[:, "series_genres"] = list(results)
+        # every chart is drawn from these, computed once
+        self.aggregates = UserlistAggregator(self.df, self.opts).aggregate(
+            d.name for d in drivers
+        )
 
         self.drivers: list[IVisualizationDriver] = [
-            MonthwiseCountDriver(self.df, self.opts),
-            CourwiseRatingsDriver(self.df, self.opts),
-            GenreDistributionDriver(self.df, self.opts),
-            GenrewiseRatingsDriver(self.df, self.opts),
-            RatingsCurveDriver(self.df, self.opts),
-            RemainingCountDriver(self.df, self.opts),
-            FormatDistributionDriver(self.df, self.opts),
-            StatusDistributionDriver(self.df, self.opts),
-            FastestFinishedDriver(self.df, self.opts),
+            d(getattr(self.aggregates, d.name), self.opts) for d in drivers
         ]
 
     @classmethod
@@ -72,71 +148,109 @@ class Visualizer:
         cls,
         xml_data,
         opts: VisualizationOptions,
+        charts: Iterable[str] = CHARTS,
     ):
-        df = pd.read_xml(xml_data)
-        return cls(df, opts)
+        df = prepare_userlist_df(pd.read_xml(xml_data))
+        return cls(df, opts, charts)
 
     def get_summary(self):
         """
-        Calculates Key Performance Indicators (KPIs) for the user's animelist.
+        Returns the Key Performance Indicators (KPIs) of the user's animelist.
         """
-        total_anime = int(len(self.df))
-        completed = int(len(self.df[self.df["my_status"] == "Completed"]))
-        total_episodes = int(self.df["my_watched_episodes"].sum())
-
-        # Mean score (excluding unrated)
-        scored_df = self.df[self.df["my_score"] > 0]
-        mean_score = float(scored_df["my_score"].mean()) if not scored_df.empty else 0.0
-
-        # Approximate watch time (assume 24 mins per episode)
-        total_minutes = total_episodes * 24
-        days = total_minutes // (24 * 60)
+        return self.aggregates.summary
 
-        # Recent activity (this month)
-        from datetime import date
+    def get_plotly_template(self) -> dict | None:
+        """
+        Returns the plotly template compact figures refer to, `None` if there are none.
+        """
+        if (
+            self.opts.compact_figures
+            and self.opts.interactive_charts
+            and not self.opts.data_only
+        ):
+            return plotly_template()
+        return None
 
-        current_month = date.today().strftime("%Y-%m")
-        finished_this_month = self.df[
-            self.df["my_finish_date"].str.startswith(current_month)
-        ]
-        count_this_month = int(len(finished_this_month))
+    @staticmethod
+    def _store_image(r: ImageVisualizationResult) -> MatplotlibVisualizationResult:
+        key = chart_store.put(r.image, r.format)
+        if key is None:
+            # the store is disabled or unreachable, inline the image after all
+            return MatplotlibVisualizationResult(
+                r.title, base64.b64encode(r.image).decode("utf-8"), r.format
+            )
+        return MatplotlibVisualizationResult(
+            r.title, "", r.format, chart_store.url(key)
+        )
 
-        # Favorite genre factor
-        genres_list = []
-        for g in self.df["series_genres"]:
-            genres_list.extend(g)
+    @classmethod
+    def _wrap_result(cls, r) -> VisualizationResult:
+        if isinstance(r, ImageVisualizationResult):
+            r = cls._store_image(r)
 
-        most_common_genre = "N/A"
-        if genres_list:
-            from collections import Counter
+        if isinstance(r, MatplotlibVisualizationResult):
+            interactive = False
+        elif isinstance(r, PlotlyVisualizationResult):
+            interactive = True
+        elif isinstance(r, DataVisualizationResult):
+            # drawn by the client, interactively
+            return VisualizationResult(True, r, data_only=True)
+        else:
+            raise Exception(f"Unknown visualization result type: {r=}")
 
-            most_common_genre = Counter(genres_list).most_common(1)[0][0]
+        return VisualizationResult(interactive, r)
 
-        return {
-            "total_anime": total_anime,
-            "completed": completed,
-            "total_episodes": total_episodes,
-            "mean_score": round(float(mean_score), 2),
-            "days_watched": int(days),
-            "finished_this_month": count_this_month,
-            "favorite_genre": most_common_genre,
-        }
-
-    def visualize_all(self):
-        results: list[VisualizationResult] = []
-        for d in self.drivers:
+    def _iter_results_serially(self, drivers: dict[int, IVisualizationDriver]):
+        for i, d in drivers.items():
             try:
-                r = d.visualize()
-                if isinstance(r, MatplotlibVisualizationResult):
-                    interactive = False
-                elif isinstance(r, PlotlyVisualizationResult):
-                    interactive = True
+                if self.opts.data_only:
+                    yield i, self._wrap_result(d.visualize_data())
                 else:
-                    raise Exception(f"Unknown visualization result type: {r=}")
-
-                generic_result = VisualizationResult(interactive, r)
-                results.append(generic_result)
+                    yield i, self._wrap_result(d.visualize())
             except Exception as e:
                 logging.error(f"error occured while visualizing {d.__class__}")
                 logging.exception(e)
-        return results
+
+    def iter_results(self):
+        """
+        Yields the index of every driver along with its `VisualizationResult`, as soon as
+        it is drawn. Drivers are drawn in the render process pool if one is configured,
+        so the results may come out of order. Failing drivers are logged and skipped.
+        """
+        drivers = dict(enumerate(self.drivers))
+        # nothing is drawn for data only results, not worth a trip to the pool
+        pool = None if self.opts.data_only else get_render_pool()
+        if pool is None:
+            yield from self._iter_results_serially(drivers)
+            return
+
+        pending = dict(drivers)
+        try:
+            futures = {pool.submit(render, d): i for i, d in drivers.items()}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    result = self._wrap_result(future.result())
+                except BrokenProcessPool:
+                    # the driver is left pending, it is drawn again below
+                    raise
+                except Exception as e:
+                    pending.pop(i)
+                    logging.error(
+                        f"error occured while visualizing {drivers[i].__class__}"
+                    )
+                    logging.exception(e)
+                    continue
+
+                pending.pop(i)
+                yield i, result
+
+        except BrokenProcessPool as e:
+            # a render process died, draw whatever is left here
+            logging.exception(e)
+            discard_render_pool()
+            yield from self._iter_results_serially(pending)
+
+    def visualize_all(self):
+        results = sorted(self.iter_results(), key=lambda item: item[0])
+        return [r for _, r in results]
@@ -0,0 +1,98 @@
+"""
+Warms a process up before it serves requests, so that the first requests don't pay for
+matplotlib's font cache, plotly's validators, sklearn's import and the anime dataset.
+Run by gunicorn in the master before the workers are forked, see gunicorn.conf.py, so
+that the workers share what was loaded, except for what can't survive a fork.
+"""
+
+import logging
+import time
+
+import numpy as np
+
+from recommendations.embed import EMBEDDING_SIZE
+from recommendations.engine import RecommendationEngine
+from visualizer.aggregates import UserlistAggregator
+from visualizer.benchmarks import synthetic_userlist
+from visualizer.drivers.base import VisualizationOptions, plotly_template
+from visualizer.visualizer import DRIVERS
+
+logger = logging.getLogger(__name__)
+
+# entries of the throwaway list the charts are drawn from
+WARMUP_LIST_SIZE = 200
+
+
+def warm_up_charts():
+    """
+    Draws every chart of a synthetic list once with matplotlib and once with plotly.
+    Nothing is looked up or stored, the drivers are fed the aggregates directly.
+    """
+    df = synthetic_userlist(WARMUP_LIST_SIZE)
+    for interactive_charts in (False, True):
+        opts = VisualizationOptions(
+            disable_nsfw=True,
+            count_upcoming=False,
+            interactive_charts=interactive_charts,
+            compact_figures=True,
+        )
+        aggregates = UserlistAggregator(df, opts).aggregate()
+        for name, driver_cls in DRIVERS.items():
+            driver_cls(getattr(aggregates, name), opts).visualize().as_dict()
+    plotly_template()
+
+
+def warm_up_recommendations(engine: RecommendationEngine):
+    """
+    Imports sklearn and loads the anime dataset. Nothing is fitted, see
+    `warm_up_kmeans`, and Qdrant isn't connected to, connections mustn't be shared
+    with forked workers.
+    """
+    import sklearn.cluster  # noqa: F401
+    import sklearn.preprocessing  # noqa: F401
+
+    engine.anime_store.positions([])
+
+
+def warm_up_kmeans():
+    """
+    Fits a throwaway KMeans, which starts the OpenMP threads of the process. These
+    don't survive a fork, a KMeans would hang in a process forked afterwards, so this
+    only runs in the workers.
+    """
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import normalize
+
+    rng = np.random.default_rng(0)
+    KMeans(2, n_init=1, init="k-means++").fit(
+        normalize(rng.random((16, EMBEDDING_SIZE)), norm="l2")
+    )
+
+
+def _run_steps(*steps):
+    """
+    Runs the given warm up steps, `(step, args)` pairs. A failing step is logged and
+    doesn't stop the others, the process is merely slower to answer its first requests.
+    """
+    for step, args in steps:
+        start = time.perf_counter()
+        try:
+            step(*args)
+        except Exception as e:
+            logger.warning(f"{step.__name__} failed: {e}")
+            continue
+        logger.info(f"{step.__name__} took {time.perf_counter() - start:.2f}s")
+
+
+def warm_up(engine: RecommendationEngine):
+    """
+    Runs the warm up steps whose work can be shared with forked workers.
+    """
+    _run_steps((warm_up_charts, ()), (warm_up_recommendations, (engine,)))
+
+
+def warm_up_worker():
+    """
+    Runs the warm up steps which must run in every worker, after it was forked.
+    """
+    _run_steps((warm_up_kmeans, ()))